@@ -0,0 +1,69 @@
+import os
+import time
+
+import numpy as np
+import pygame
+
+SOUND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sound")
+
+
+class Audio:
+    # Wall hits played through a fixed pool of mixer channels. The sounds are decoded once when the
+    # pool is made; hits are only collected while the physics runs and flush() plays at most
+    # per_frame of them, the hardest first, so a frame costs the same however many balls bounce.
+    # A hit softer than min_speed is not played, one at full_speed or faster plays at full volume.
+    # When every channel is busy the voice that has played longest is cut off for the new one.
+    # Without a sound device (or with enabled=False) everything is a no-op.
+    def __init__(self, names=("pop-1.mp3",), channels=8, per_frame=2, min_speed=1.0, full_speed=8.0, enabled=True):
+        self.per_frame = per_frame
+        self.min_speed = min_speed
+        self.full_speed = full_speed
+        self.pending = []
+        self.played = 0
+        self.dropped = 0
+        self.enabled = enabled
+        if enabled:
+            try:
+                if not pygame.mixer.get_init():
+                    pygame.mixer.init()
+                # every name decoded to a sample buffer now, not on the first hit
+                self.sounds = [pygame.mixer.Sound(os.path.join(SOUND_DIR, name)) for name in names]
+            except (pygame.error, FileNotFoundError):
+                self.enabled = False
+        if self.enabled:
+            pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), channels))
+            pygame.mixer.set_reserved(channels)  # pygame's own Sound.play() never takes these
+            self.channels = [pygame.mixer.Channel(i) for i in range(channels)]
+            self.started = [0.0] * channels
+            self.next_sound = 0
+
+    def hit(self, speeds):
+        # Queue the impact speeds of one physics step
+        if self.enabled and len(speeds):
+            self.pending.append(speeds)
+
+    def flush(self):
+        # Once per frame: play the hardest hits queued since the last flush and forget the rest
+        if not self.pending:
+            return 0
+        speeds = np.concatenate(self.pending)
+        self.pending = []
+        speeds = speeds[speeds >= self.min_speed]
+        if len(speeds) > self.per_frame:
+            self.dropped += len(speeds) - self.per_frame
+            speeds = np.partition(speeds, len(speeds) - self.per_frame)[-self.per_frame:]
+        for speed in speeds.tolist():
+            self.play(min(1.0, speed / self.full_speed))
+        return len(speeds)
+
+    def play(self, volume):
+        now = time.perf_counter()
+        free = next((i for i, channel in enumerate(self.channels) if not channel.get_busy()), None)
+        if free is None:
+            free = min(range(len(self.channels)), key=self.started.__getitem__)  # voice stealing
+        channel = self.channels[free]
+        channel.set_volume(volume)
+        channel.play(self.sounds[self.next_sound])
+        self.next_sound = (self.next_sound + 1) % len(self.sounds)
+        self.started[free] = now
+        self.played += 1
@@ -0,0 +1,35 @@
+import os
+import time
+
+import numpy as np
+import pygame
+
+from audio import SOUND_DIR, Audio
+
+FRAMES = 50
+
+if __name__ == "__main__":
+    pygame.mixer.init()
+    sound = pygame.mixer.Sound(os.path.join(SOUND_DIR, "pop-1.mp3"))
+    audio = Audio()
+    if not audio.enabled:
+        raise SystemExit("no sound device (SDL_AUDIODRIVER=dummy works without one)")
+    rng = np.random.default_rng(0)
+    print(f"{'hits/frame':>10} {'play per hit ms':>16} {'Audio ms':>9} {'played/frame':>13}")
+    for hits in (1, 10, 100, 1000, 10000):
+        speeds = rng.uniform(0, 10, hits)
+        start = time.perf_counter()
+        for _ in range(FRAMES):
+            for _ in range(hits):
+                sound.play()  # what the game did for every hit
+        t_old = (time.perf_counter() - start) / FRAMES * 1000
+        pygame.mixer.stop()
+
+        played = audio.played
+        start = time.perf_counter()
+        for _ in range(FRAMES):
+            audio.hit(speeds)
+            audio.flush()
+        t_new = (time.perf_counter() - start) / FRAMES * 1000
+        pygame.mixer.stop()
+        print(f"{hits:10d} {t_old:16.3f} {t_new:9.3f} {(audio.played - played) / FRAMES:13.1f}")
@@ -0,0 +1,97 @@
+import time
+
+import numpy as np
+
+from physics import BALL_RADIUS, candidate_pairs, resolve_pairs
+
+DENSITY = 800 / (np.pi * 200 ** 2)  # balls per square pixel of a half-full ring
+
+
+class Ball:
+    # The game's original one-object-per-ball physics, kept here to time the loops against
+    def __init__(self, position, velocity):
+        self.position = np.array(position, dtype=np.float64)
+        self.velocity = np.array(velocity, dtype=np.float64)
+
+
+def resolve_collision(ball1, ball2):
+    delta = ball1.position - ball2.position
+    dist = np.linalg.norm(delta)
+
+    if dist == 0:
+        return
+
+    if dist < 2 * BALL_RADIUS:
+        normal = delta / dist
+
+        rel_vel = ball1.velocity - ball2.velocity
+        if np.dot(rel_vel, normal) > 0:
+            return
+
+        v1 = np.dot(ball1.velocity, normal)
+        v2 = np.dot(ball2.velocity, normal)
+
+        ball1.velocity += (v2 - v1) * normal
+        ball2.velocity += (v1 - v2) * normal
+
+        overlap = 2 * BALL_RADIUS - dist + 0.01
+        ball1.position += normal * (overlap / 2)
+        ball2.position -= normal * (overlap / 2)
+
+
+def random_balls(n, seed=0):
+    # n balls at ring-like density, spread over a disc big enough to hold them
+    rng = np.random.default_rng(seed)
+    radius = np.sqrt(n / DENSITY / np.pi)
+    angle = rng.uniform(0, 2 * np.pi, n)
+    dist = radius * np.sqrt(rng.random(n))
+    positions = np.column_stack((dist * np.cos(angle), dist * np.sin(angle)))
+    velocities = rng.uniform(-2, 2, (n, 2))
+    return [Ball(p, v) for p, v in zip(positions, velocities)]
+
+
+def all_pairs(balls):
+    for i in range(len(balls)):
+        for j in range(i + 1, len(balls)):
+            resolve_collision(balls[i], balls[j])
+
+
+def grid_pairs(balls):
+    # returns the number of pairs tested and the time spent finding them
+    start = time.perf_counter()
+    positions = np.array([ball.position for ball in balls])
+    i, j = candidate_pairs(positions)
+    broad = time.perf_counter() - start
+    for a, b in zip(i.tolist(), j.tolist()):
+        resolve_collision(balls[a], balls[b])
+    return len(i), broad
+
+
+def vectorized_pairs(balls):
+    position = np.array([ball.position for ball in balls])
+    velocity = np.array([ball.velocity for ball in balls])
+    start = time.perf_counter()
+    i, j = candidate_pairs(position)
+    resolve_pairs(position, velocity, i, j)
+    return time.perf_counter() - start
+
+
+print(f"{'balls':>7} {'all pairs':>12} {'grid pairs':>11} {'all ms/frame':>13} {'grid ms/frame':>14} {'broad phase ms':>15} {'vectorized ms':>14}")
+for n in (50, 200, 1000, 2000, 5000, 10000):
+    balls = random_balls(n)
+    start = time.perf_counter()
+    tested, t_broad = grid_pairs(balls)
+    t_grid = time.perf_counter() - start
+
+    t_vector = vectorized_pairs(random_balls(n))
+
+    t_all = None
+    if n <= 1000:  # the double loop takes minutes past this
+        balls = random_balls(n)
+        start = time.perf_counter()
+        all_pairs(balls)
+        t_all = time.perf_counter() - start
+
+    all_ms = f"{t_all * 1000:13.1f}" if t_all is not None else f"{'-':>13}"
+    print(f"{n:7d} {n * (n - 1) // 2:12d} {tested:11d} {all_ms} {t_grid * 1000:14.1f} {t_broad * 1000:15.1f} {t_vector * 1000:14.1f}")
+print(f"grid cell {2 * BALL_RADIUS}px, balls in the same or a neighbouring cell are tested")
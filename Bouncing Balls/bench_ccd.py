@@ -0,0 +1,44 @@
+import time
+
+import numpy as np
+
+from physics import BallSystem
+
+CENTER = np.array([300.0, 300.0])
+RING = 200
+BALLS = 2000
+SPIN = 0.05  # faster than the game's, so where in the step a ball meets the gap matters
+
+
+def fire(speed, substeps, swept, seed=0):
+    steps = int(1.3 * RING / speed) + 1  # long enough for every ball to reach the wall once
+    # BALLS balls without ball-ball collisions, shot from near the centre in every direction at
+    # speed pixels per step; returns which ones got out, where they are and the ms per step
+    rng = np.random.default_rng(seed)
+    balls = BallSystem(CENTER, RING, spinning_speed=SPIN, capacity=BALLS, swept=swept)
+    angle = rng.uniform(0, 2 * np.pi, BALLS)
+    for a, offset in zip(angle, rng.uniform(-20, 20, (BALLS, 2))):
+        balls.add(CENTER + offset, speed * np.array([np.cos(a), np.sin(a)]))
+    start_angle, end_angle = np.radians(-30), np.radians(30)
+    dt = 1 / substeps
+    start = time.perf_counter()
+    for _ in range(steps):
+        start_angle += SPIN
+        end_angle += SPIN
+        for k in range(substeps):
+            behind = SPIN * (substeps - 1 - k) * dt
+            balls.step(start_angle - behind, end_angle - behind, dt)
+    elapsed = (time.perf_counter() - start) / steps * 1000
+    return ~balls.is_in[:BALLS], balls.position[:BALLS].copy(), elapsed
+
+
+print(f"{BALLS} balls, ring turning {SPIN} rad/step, compared with 256 swept substeps after each has met the wall")
+print(f"{'speed':>6} {'method':>14} {'wrong gap':>10} {'mean error px':>14} {'ms/step':>8}")
+for speed in (5, 20, 50, 100):
+    out, position, _ = fire(speed, 256, True)
+    for name, substeps, swept in (("end point x1", 1, False), ("end point x8", 8, False), ("swept x1", 1, True)):
+        got_out, got, ms = fire(speed, substeps, swept)
+        wrong = np.count_nonzero(got_out != out)
+        both_in = ~out & ~got_out
+        error = np.linalg.norm(got[both_in] - position[both_in], axis=1).mean() if both_in.any() else 0.0
+        print(f"{speed:6d} {name:>14} {wrong:10d} {error:14.2f} {ms:8.3f}")
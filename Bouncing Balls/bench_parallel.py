@@ -0,0 +1,54 @@
+import multiprocessing as mp
+import time
+
+import numpy as np
+
+from parallel import ParallelSystem
+from physics import BallSystem
+from simulation import ring_of_balls
+
+BALLS = 100_000
+STEPS = 20
+SUBSTEPS = 2
+
+
+def single(center, ring_radius, positions, velocities):
+    # the Bouncing Balls.py loop: one BallSystem, escaped balls dropped instead of respawned
+    balls = BallSystem(center, ring_radius, capacity=len(positions))
+    for p, v in zip(positions, velocities):
+        balls.add(p, v, (255, 255, 255))
+    start_angle, end_angle = np.radians(-30), np.radians(30)
+    start = time.perf_counter()
+    for _ in range(STEPS):
+        start_angle += 0.01
+        end_angle += 0.01
+        balls.alive[:balls.count] &= ~balls.outside(2 * center[0], 2 * center[1])
+        balls.compact()
+        balls.advance(start_angle, end_angle, SUBSTEPS)
+    return STEPS / (time.perf_counter() - start), len(balls)
+
+
+def parallel(workers, center, ring_radius, positions, velocities):
+    with ParallelSystem(center, ring_radius, positions, velocities, workers,
+                        colors=np.full((len(positions), 3), 255)) as balls:
+        start_angle, end_angle = np.radians(-30), np.radians(30)
+        balls.advance(start_angle, end_angle, SUBSTEPS)  # workers started and warmed up
+        start = time.perf_counter()
+        for _ in range(STEPS):
+            start_angle += 0.01
+            end_angle += 0.01
+            balls.advance(start_angle, end_angle, SUBSTEPS)
+        return STEPS / (time.perf_counter() - start), len(balls)
+
+
+if __name__ == "__main__":
+    world = ring_of_balls(BALLS)
+    base, left = single(*world)
+    print(f"{BALLS} balls, {SUBSTEPS} substeps per step, {mp.cpu_count()} cores")
+    print(f"{'processes':>10} {'steps/s':>8} {'speedup':>8} {'balls left':>11}")
+    print(f"{'single':>10} {base:8.2f} {1:8.2f} {left:11d}")
+    workers = 1
+    while workers <= mp.cpu_count():
+        rate, left = parallel(workers, *world)
+        print(f"{workers:10d} {rate:8.2f} {rate / base:8.2f} {left:11d}")
+        workers *= 2
@@ -0,0 +1,54 @@
+import argparse
+import csv
+import os
+import platform
+
+import numpy as np
+
+from simulation import Simulation
+
+COUNTS = (10, 100, 1000, 10_000, 100_000)
+WORK = 200_000  # ball-steps timed per ball count, so big counts run few steps and small ones many
+
+
+def phases(sim, steps):
+    # Run the simulation's steps with BallSystem.advance timing its phases; returns ms per step of
+    # collision, integration, boundary and the rest of the step (copying the previous positions,
+    # gathering the impacts, sleep), and the whole step
+    sim.balls.timings = np.zeros(4)
+    sim.run(steps)
+    collide, integrate, boundary, total = sim.balls.timings / steps * 1000
+    sim.balls.timings = None
+    return collide, integrate, boundary, total - collide - integrate - boundary, total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the physics phases from 10 to 100k balls")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-balls", type=int, default=COUNTS[-1])
+    parser.add_argument("--csv", help="also write the table to this file, to compare runs")
+    args = parser.parse_args()
+
+    print(f"python {platform.python_version()}, numpy {np.__version__}, {platform.machine()}, "
+          f"{os.cpu_count()} cpus, seed {args.seed}")
+    header = ("balls", "steps", "collision ms", "integration ms", "boundary ms", "other ms", "total ms", "steps/s",
+              "digest")
+    print(f"{header[0]:>7} {header[1]:>6} {header[2]:>13} {header[3]:>15} {header[4]:>12} {header[5]:>9} "
+          f"{header[6]:>9} {header[7]:>8} {header[8]:>13}")
+    rows = []
+    for n in COUNTS:
+        if n > args.max_balls:
+            break
+        # a closed ring with every ball awake, so all n balls are simulated on every step
+        sim = Simulation(n, args.seed, respawn=False, sleep_steps=0, arc_degrees=0)
+        sim.run(2)  # warm up
+        steps = max(3, WORK // n)
+        collide, integrate, boundary, other, total = phases(sim, steps)
+        rows.append((n, steps, collide, integrate, boundary, other, total, 1000 / total, sim.digest()))
+        print(f"{n:7d} {steps:6d} {collide:13.3f} {integrate:15.3f} {boundary:12.3f} {other:9.3f} {total:9.3f} "
+              f"{1000 / total:8.0f} {sim.digest():>13}")
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
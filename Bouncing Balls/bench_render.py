@@ -0,0 +1,49 @@
+import random
+import time
+
+import numpy as np
+import pygame
+
+from physics import BALL_COLORS, BALL_RADIUS
+from render import Renderer, draw_arc
+
+WIDTH = HEIGHT = 600
+CENTER = np.array([WIDTH / 2, HEIGHT / 2])
+RING = WIDTH / 3
+ORANGE = (255, 165, 0)
+FRAMES = 20
+
+
+def old_frame(window, start_angle, end_angle, positions, colors):
+    # what the game loop drew before: fill, ring, gap polygon, one draw.circle per ball
+    window.fill((0, 0, 0))
+    pygame.draw.circle(window, ORANGE, CENTER, RING, 3)
+    draw_arc(window, CENTER, RING, start_angle, end_angle)
+    for position, color in zip(positions, colors):
+        pygame.draw.circle(window, color, position, BALL_RADIUS)
+
+
+def run(frame, positions, colors):
+    start_angle, end_angle = np.radians(-30), np.radians(30)
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        start_angle += 0.01
+        end_angle += 0.01
+        frame(window, start_angle, end_angle, positions, colors)
+    return (time.perf_counter() - start) / FRAMES * 1000
+
+
+pygame.init()
+window = pygame.Surface((WIDTH, HEIGHT))  # offscreen, no display needed
+renderer = Renderer((WIDTH, HEIGHT), CENTER, RING, 60, ORANGE)
+print(f"{'balls':>6} {'draw.circle ms':>15} {'sprites ms':>11} {'speedup':>8}")
+for n in (50, 1000, 10000, 50000):
+    rng = np.random.default_rng(0)
+    angle = rng.uniform(0, 2 * np.pi, n)
+    dist = RING * np.sqrt(rng.random(n))
+    positions = CENTER + np.column_stack((dist * np.cos(angle), dist * np.sin(angle)))
+    colors = np.array([random.choice(BALL_COLORS) for _ in range(n)], dtype=np.uint8)
+    renderer.draw(window, 0, 1, positions, colors)  # sprites made outside the timing, as in the game
+    t_old = run(old_frame, positions, colors)
+    t_new = run(renderer.draw, positions, colors)
+    print(f"{n:6d} {t_old:15.2f} {t_new:11.2f} {t_old / t_new:8.1f}")
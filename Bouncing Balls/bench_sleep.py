@@ -0,0 +1,39 @@
+import time
+
+import numpy as np
+
+from physics import BallSystem
+
+CENTER = np.array([300.0, 300.0])
+RING = 200
+STEPS = 1200  # physics steps per run, reported in two halves: settling and settled
+SUBSTEPS = 2
+
+
+def run(n, sleep_steps, seed=0):
+    # n balls dropped inside the ring with the gap held still at the side, so the ones left
+    # inside pile up at the bottom; returns ms per step for both halves and the final counts
+    rng = np.random.default_rng(seed)
+    balls = BallSystem(CENTER, RING, spinning_speed=0.0, capacity=n, sleep_steps=sleep_steps)
+    angle = rng.uniform(0, 2 * np.pi, n)
+    dist = (RING - 10) * np.sqrt(rng.random(n))
+    for a, d, v in zip(angle, dist, rng.uniform(-2, 2, (n, 2))):
+        balls.add(CENTER + d * np.array([np.cos(a), np.sin(a)]), v)
+    start_angle, end_angle = np.radians(-30), np.radians(30)
+    times = []
+    for half in range(2):
+        start = time.perf_counter()
+        for _ in range(STEPS // 2):
+            balls.alive[:balls.count] &= ~balls.outside(2 * CENTER[0], 2 * CENTER[1])
+            balls.compact()
+            balls.advance(start_angle, end_angle, SUBSTEPS)
+        times.append((time.perf_counter() - start) / (STEPS // 2) * 1000)
+    return times, len(balls), balls.active_count, balls.sleeping_count
+
+
+print(f"{'balls':>6} {'sleep':>6} {'settling ms':>12} {'settled ms':>11} {'left':>6} {'active':>7} {'sleeping':>9}")
+for n in (200, 1000, 3000):
+    for sleep_steps in (0, 30):
+        (settling, settled), left, active, sleeping = run(n, sleep_steps)
+        print(f"{n:6d} {'on' if sleep_steps else 'off':>6} {settling:12.2f} {settled:11.2f} {left:6d} {active:7d} {sleeping:9d}")
+print(f"ms per physics step of {SUBSTEPS} substeps, first and second half of {STEPS} steps")
@@ -0,0 +1,323 @@
+import argparse
+import multiprocessing as mp
+import random
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from physics import BALL_COLORS, BALL_RADIUS, BallSystem, candidate_pairs, resolve_pairs
+from simulation import ring_of_balls
+
+GHOST = 2 * BALL_RADIUS + 1  # balls this close to a strip edge are also seen by the strip next door
+RECORD = 8  # x, y, vx, vy, is_in, r, g, b: one ball in the exchange buffers
+
+
+def layout(workers, capacity):
+    # Every array in the shared block: name -> (shape, dtype). Strip w keeps its balls in rows
+    # [w, :count[w]] of position, velocity, is_in and color; ghosts and migrants[w, side] are what
+    # strip w hands to its left (side 0) and right (side 1) neighbour
+    return {
+        "position": ((workers, capacity, 2), np.float64),
+        "velocity": ((workers, capacity, 2), np.float64),
+        "is_in": ((workers, capacity), bool),
+        "color": ((workers, capacity, 3), np.uint8),
+        "count": ((workers,), np.int64),
+        "ghosts": ((workers, 2, capacity, 4), np.float64),
+        "ghost_count": ((workers, 2), np.int64),
+        "migrants": ((workers, 2, capacity, RECORD), np.float64),
+        "migrant_count": ((workers, 2), np.int64),
+        "hits": ((workers,), np.int64),
+        "escaped": ((workers,), np.int64),
+        "control": ((3,), np.float64),  # start angle, end angle, substeps (0 tells the workers to stop)
+        "full": ((workers,), bool),
+    }
+
+
+def block_size(spec):
+    return sum(np.dtype(dtype).itemsize * int(np.prod(shape)) for shape, dtype in spec.values())
+
+
+def views(buffer, spec):
+    # numpy arrays over the shared block, laid out one after the other in spec order
+    arrays, offset = {}, 0
+    for name, (shape, dtype) in spec.items():
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+        offset += np.dtype(dtype).itemsize * int(np.prod(shape))
+    return arrays
+
+
+class Strip:
+    # One worker's side of the simulation: the balls with lo <= x < hi, kept in the shared rows of
+    # strip w. The ring itself comes from a BallSystem that holds no balls.
+    def __init__(self, w, edges, arrays, ring):
+        self.w = w
+        self.lo, self.hi = edges[w], edges[w + 1]
+        self.last = len(edges) - 2
+        self.a = arrays
+        self.ring = ring
+
+    @property
+    def count(self):
+        return int(self.a["count"][self.w])
+
+    def publish_ghosts(self):
+        # Copy the balls next to each edge where the neighbour can read them
+        n, a = self.count, self.a
+        x = a["position"][self.w, :n, 0]
+        for side, near in ((0, x < self.lo + GHOST), (1, x >= self.hi - GHOST)):
+            if (side == 0 and self.w == 0) or (side == 1 and self.w == self.last):
+                continue
+            rows = np.flatnonzero(near)
+            a["ghosts"][self.w, side, :len(rows), :2] = a["position"][self.w, rows]
+            a["ghosts"][self.w, side, :len(rows), 2:] = a["velocity"][self.w, rows]
+            a["ghost_count"][self.w, side] = len(rows)
+
+    def read_ghosts(self):
+        # The neighbours' balls next to this strip's edges, (k, 4) rows of position and velocity
+        a, parts = self.a, []
+        if self.w > 0:
+            parts.append(a["ghosts"][self.w - 1, 1, :a["ghost_count"][self.w - 1, 1]])
+        if self.w < self.last:
+            parts.append(a["ghosts"][self.w + 1, 0, :a["ghost_count"][self.w + 1, 0]])
+        return np.concatenate(parts) if parts else np.zeros((0, 4))
+
+    def collide(self, ghosts):
+        # Contacts among this strip's balls and with the ghosts; only this strip's rows are written
+        # back, the neighbour resolves the same edge contacts for its own balls
+        n, a = self.count, self.a
+        position = np.concatenate((a["position"][self.w, :n], ghosts[:, :2]))
+        velocity = np.concatenate((a["velocity"][self.w, :n], ghosts[:, 2:]))
+        i, j = candidate_pairs(position)
+        own = i < n  # pairs come sorted by i, so the ghost-only ones are at the end
+        resolve_pairs(position, velocity, i[own], j[own])
+        a["position"][self.w, :n] = position[:n]
+        a["velocity"][self.w, :n] = velocity[:n]
+
+    def step(self, start_angle, end_angle, dt):
+        n, a = self.count, self.a
+        a["hits"][self.w] += self.ring.ring(a["position"][self.w, :n], a["velocity"][self.w, :n],
+                                            a["is_in"][self.w, :n], start_angle, end_angle, dt)
+
+    def send(self, width, height):
+        # Hand the balls that crossed an edge to the neighbour and drop the ones that left the window
+        n, a = self.count, self.a
+        position = a["position"][self.w, :n]
+        x, y = position[:, 0], position[:, 1]
+        gone = (y > height) | (x < 0) | (x > width) | (y < 0)
+        a["escaped"][self.w] += np.count_nonzero(gone)
+        for side, crossed in ((0, x < self.lo), (1, x >= self.hi)):
+            rows = np.flatnonzero(crossed & ~gone)
+            a["migrants"][self.w, side, :len(rows)] = self.records(rows)
+            a["migrant_count"][self.w, side] = len(rows)
+            gone |= crossed
+        self.keep(np.flatnonzero(~gone))
+
+    def receive(self):
+        a, parts = self.a, []
+        if self.w > 0:
+            parts.append(a["migrants"][self.w - 1, 1, :a["migrant_count"][self.w - 1, 1]])
+        if self.w < self.last:
+            parts.append(a["migrants"][self.w + 1, 0, :a["migrant_count"][self.w + 1, 0]])
+        records = np.concatenate(parts) if parts else np.zeros((0, RECORD))
+        n = self.count
+        if n + len(records) > a["position"].shape[1]:
+            a["full"][self.w] = True
+            return False
+        a["position"][self.w, n:n + len(records)] = records[:, 0:2]
+        a["velocity"][self.w, n:n + len(records)] = records[:, 2:4]
+        a["is_in"][self.w, n:n + len(records)] = records[:, 4] > 0
+        a["color"][self.w, n:n + len(records)] = records[:, 5:8]
+        a["count"][self.w] = n + len(records)
+        return True
+
+    def records(self, rows):
+        a = self.a
+        return np.column_stack((a["position"][self.w, rows], a["velocity"][self.w, rows],
+                                a["is_in"][self.w, rows], a["color"][self.w, rows]))
+
+    def keep(self, rows):
+        a = self.a
+        for name in ("position", "velocity", "is_in", "color"):
+            a[name][self.w, :len(rows)] = a[name][self.w, rows]
+        a["count"][self.w] = len(rows)
+
+
+def work(w, name, workers, capacity, edges, ring_args, size, steps, barrier):
+    # Worker process: wait for a step, run it on strip w in lock step with the other strips, repeat.
+    # steps is the barrier the main process also waits on, barrier is the workers' own
+    shm = shared_memory.SharedMemory(name=name)
+    arrays = strip = None
+    try:
+        arrays = views(shm.buf, layout(workers, capacity))
+        strip = Strip(w, edges, arrays, BallSystem(*ring_args, capacity=1))
+        width, height = size
+        while True:
+            steps.wait()
+            start_angle, end_angle, substeps = arrays["control"]
+            if substeps == 0:
+                break
+            substeps = int(substeps)
+            dt = 1 / substeps
+            spin = strip.ring.spinning_speed
+            for k in range(substeps):
+                strip.publish_ghosts()
+                barrier.wait()
+                strip.collide(strip.read_ghosts())
+                behind = spin * (substeps - 1 - k) * dt
+                strip.step(start_angle - behind, end_angle - behind, dt)
+                barrier.wait()  # nobody republishes ghosts while a neighbour still reads them
+            strip.send(width, height)
+            barrier.wait()
+            if not strip.receive():
+                steps.abort()
+                break
+            steps.wait()
+    except threading.BrokenBarrierError:
+        pass
+    except BaseException:
+        # let the others and the main process out of their barriers instead of waiting forever
+        steps.abort()
+        barrier.abort()
+        raise
+    finally:
+        arrays = strip = None  # the views must go before the block can be closed
+        shm.close()
+
+
+class ParallelSystem:
+    # The ring area cut into vertical strips, one worker process each. Balls live in shared memory,
+    # each strip's in its own rows; every substep a strip publishes the balls next to its edges as
+    # ghosts, resolves its contacts including the neighbours' ghosts, and moves its own balls. Balls
+    # that cross an edge move to the neighbour at the end of the step. The main process only starts
+    # steps and reads the shared arrays to draw them.
+    def __init__(self, center, ring_radius, positions, velocities, workers=None, colors=None, gravity=0.2,
+                 loss_energy=0.95, friction=0.1, spinning_speed=0.01, size=None, capacity=None):
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        velocities = np.asarray(velocities, dtype=np.float64).reshape(-1, 2)
+        self.workers = workers or mp.cpu_count()
+        if colors is None:
+            colors = [random.choice(BALL_COLORS) for _ in positions]
+        # edges at the quantiles of the starting x, so every strip starts with the same share of balls
+        inner = np.quantile(positions[:, 0], np.arange(1, self.workers) / self.workers) if len(positions) else \
+            center[0] + ring_radius * np.linspace(-1, 1, self.workers + 1)[1:-1]
+        self.edges = np.concatenate(([-np.inf], inner, [np.inf]))
+        strip = np.searchsorted(self.edges, positions[:, 0], side="right") - 1
+        self.capacity = capacity or 2 * (len(positions) // self.workers) + 1024
+        self.spec = layout(self.workers, self.capacity)
+        self.shm = shared_memory.SharedMemory(create=True, size=block_size(self.spec))
+        self.arrays = views(self.shm.buf, self.spec)
+        for name in ("count", "ghost_count", "migrant_count", "hits", "escaped", "full"):
+            self.arrays[name][:] = 0
+        for w in range(self.workers):
+            rows = np.flatnonzero(strip == w)
+            if len(rows) > self.capacity:
+                raise ValueError(f"strip {w} has {len(rows)} balls, capacity is {self.capacity}")
+            self.arrays["position"][w, :len(rows)] = positions[rows]
+            self.arrays["velocity"][w, :len(rows)] = velocities[rows]
+            self.arrays["is_in"][w, :len(rows)] = True
+            self.arrays["color"][w, :len(rows)] = np.asarray(colors, dtype=np.uint8).reshape(-1, 3)[rows]
+            self.arrays["count"][w] = len(rows)
+
+        self.size = size or (2 * center[0], 2 * center[1])
+        self.steps = mp.Barrier(self.workers + 1)
+        self.barrier = mp.Barrier(self.workers)  # kept, a spawned worker unpickles it after start()
+        ring_args = (np.asarray(center, dtype=np.float64), ring_radius, gravity, loss_energy, friction, spinning_speed)
+        self.processes = [mp.Process(target=work, daemon=True,
+                                     args=(w, self.shm.name, self.workers, self.capacity, self.edges, ring_args,
+                                           self.size, self.steps, self.barrier))
+                          for w in range(self.workers)]
+        for process in self.processes:
+            process.start()
+
+    def __len__(self):
+        return int(self.arrays["count"].sum())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def escaped(self):
+        return int(self.arrays["escaped"].sum())
+
+    def advance(self, start_angle, end_angle, substeps=1):
+        # One physics step on every strip, same meaning as BallSystem.advance. Returns the wall hits
+        self.arrays["control"][:] = (start_angle, end_angle, substeps)
+        self.arrays["hits"][:] = 0
+        try:
+            self.steps.wait()  # go
+            self.steps.wait()  # every strip done
+        except threading.BrokenBarrierError:
+            full = np.flatnonzero(self.arrays["full"])
+            self.close()
+            raise RuntimeError(f"strip {full.tolist()} ran out of its {self.capacity} rows") from None
+        return int(self.arrays["hits"].sum())
+
+    def strips(self):
+        # (position, color) views of each strip's balls, for drawing; valid until the next advance()
+        count = self.arrays["count"]
+        return [(self.arrays["position"][w, :count[w]], self.arrays["color"][w, :count[w]])
+                for w in range(self.workers)]
+
+    def close(self):
+        if self.shm is None:
+            return
+        if not self.steps.broken:
+            self.arrays["control"][2] = 0
+            try:
+                self.steps.wait(timeout=5)
+            except threading.BrokenBarrierError:
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.arrays = None
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
+
+if __name__ == "__main__":
+    import pygame
+
+    parser = argparse.ArgumentParser(description="Many bouncing balls simulated by several processes")
+    parser.add_argument("--balls", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=mp.cpu_count())
+    parser.add_argument("--substeps", type=int, default=2)
+    args = parser.parse_args()
+
+    center, ring_radius, positions, velocities = ring_of_balls(args.balls)
+    world = 2 * center
+    view = 800
+    scale = view / world.max()
+    pygame.init()
+    window = pygame.display.set_mode((view, view))
+    clock = pygame.time.Clock()
+    start_angle, end_angle = np.radians(-30), np.radians(30)
+    with ParallelSystem(center, ring_radius, positions, velocities, args.workers) as balls:
+        running = True
+        while running:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+            start_angle += 0.01
+            end_angle += 0.01
+            balls.advance(start_angle, end_angle, args.substeps)
+
+            # one pixel per ball straight into the window's pixels, from the shared arrays
+            window.fill((0, 0, 0))
+            pygame.draw.circle(window, (255, 165, 0), center * scale, ring_radius * scale, 2)
+            pixels = pygame.surfarray.pixels3d(window)
+            for position, color in balls.strips():
+                p = (position * scale).astype(np.int64)
+                on = (p[:, 0] >= 0) & (p[:, 0] < view) & (p[:, 1] >= 0) & (p[:, 1] < view)
+                pixels[p[on, 0], p[on, 1]] = color[on]
+            del pixels
+            pygame.display.flip()
+            pygame.display.set_caption(f"{len(balls)} balls  {args.workers} workers  {clock.get_fps():.0f} fps")
+            clock.tick()
+    pygame.quit()
@@ -0,0 +1,479 @@
+import math
+import random
+import time
+
+import numpy as np
+
+BALL_RADIUS = 5
+# new balls get a random colour out of 6 levels per channel (not black, the background), so the
+# renderer needs a few hundred sprites and not one per ball
+BALL_COLORS = [(r, g, b) for r in range(0, 256, 51) for g in range(0, 256, 51) for b in range(0, 256, 51)][1:]
+
+
+def is_ball_in_arc(ball_pos, CIRCLE_CENTER, start_angle, end_angle):
+    dx = ball_pos[0] - CIRCLE_CENTER[0]
+    dy = ball_pos[1] - CIRCLE_CENTER[1]
+    ball_angle = math.atan2(dy, dx)
+    start_angle = start_angle % (2 * math.pi)
+    end_angle = end_angle % (2 * math.pi)
+    if start_angle > end_angle:
+        end_angle += 2 * math.pi
+
+    if start_angle <= ball_angle <= end_angle or start_angle <= ball_angle + 2 * math.pi <= end_angle:
+        return True
+
+
+def balls_in_arc(positions, center, start_angle, end_angle):
+    # is_ball_in_arc for an (N, 2) array of positions at once
+    angles = np.arctan2(positions[:, 1] - center[1], positions[:, 0] - center[0])
+    start_angle = start_angle % (2 * math.pi)
+    end_angle = end_angle % (2 * math.pi)
+    if start_angle > end_angle:
+        end_angle += 2 * math.pi
+    return (((start_angle <= angles) & (angles <= end_angle))
+            | ((start_angle <= angles + 2 * math.pi) & (angles + 2 * math.pi <= end_angle)))
+
+
+SLEEPY = 0.5  # share of sleeping balls from which only the awake ones look for neighbours in the broad phase
+# Sleep only pays once most balls rest: nobody sleeps until this share of the balls has stayed put,
+# and once fewer than half that share still rest the last sleepers are woken too
+RESTING = 0.5
+NO_PAIRS = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+NO_IMPACTS = np.zeros(0)
+
+
+def candidate_pairs(positions, cell_size=2 * BALL_RADIUS, active=None):
+    # Broad phase on a uniform grid of cell_size squares: the pairs (i, j), i < j, of balls in the
+    # same or neighbouring cells, which includes every pair closer than cell_size.
+    # Balls are sorted by cell, so the balls of any cell are one slice found with searchsorted.
+    # With an active mask only pairs with at least one active ball are returned, and only the
+    # active balls look for neighbours, so the work follows the number of active balls.
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+    if len(positions) < 2:
+        return NO_PAIRS
+    cells = np.floor(positions / cell_size).astype(np.int64)
+    cells -= cells.min(axis=0)
+    height = cells[:, 1].max() + 2  # a spare row so the cells above and below never wrap into another column
+    keys = cells[:, 0] * height + cells[:, 1]
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+
+    if active is None:
+        # the ball's own cell (only the balls after it) and half of the neighbours, so each pair comes once
+        queries = np.arange(len(keys))
+        offsets = (0, height - 1, height, height + 1, 1)
+    else:
+        # every neighbour; pairs of two active balls are found twice and deduplicated below
+        queries = np.flatnonzero(active[order])
+        offsets = (-height - 1, -height, -height + 1, -1, 0, 1, height - 1, height, height + 1)
+    firsts, seconds = [], []
+    for offset in offsets:
+        query = keys[queries] + offset
+        if offset == 0 and active is None:
+            start = queries + 1
+        else:
+            start = np.searchsorted(keys, query, side="left")
+        end = np.searchsorted(keys, query, side="right")
+        counts = end - start
+        if not counts.any():
+            continue
+        owners = np.repeat(queries, counts)
+        # index of each pair's second ball: its slice start plus its rank inside the slice
+        ranks = np.arange(len(owners)) - np.repeat(np.cumsum(counts) - counts, counts)
+        firsts.append(owners)
+        seconds.append(np.repeat(start, counts) + ranks)
+    if not firsts:
+        return NO_PAIRS
+
+    a = order[np.concatenate(firsts)]
+    b = order[np.concatenate(seconds)]
+    if active is not None:
+        keep = (a != b) & (~active[b] | (a < b))
+        a, b = a[keep], b[keep]
+    i, j = np.minimum(a, b), np.maximum(a, b)
+    # the order of the old i < j double loop, which resolves contacts one after the other
+    pairs = np.lexsort((j, i))
+    return i[pairs], j[pairs]
+
+
+def resolve_pairs(position, velocity, i, j, iterations=1):
+    # The old per-object resolve_collision (now in bench_broadphase) for every pair (i[k], j[k]), in
+    # place, with whole-array passes instead of a Python call per pair. Gauss-Seidel like the old
+    # loop: each pass resolves a batch of pairs that share no ball, namely the pairs that come
+    # first, in the given order, at both of their balls.
+    # A ball's pairs are therefore resolved one after another in that order. Only the pairs touching
+    # when a pass starts take part in it, though: a contact made by another pair's push-out waits
+    # for the next pass, or with the game's single iteration for the next substep, where the old
+    # loop resolved it straight away. So this matches the old loop only once it is given the same
+    # up-front filter; against the plain old loop dense piles end up a few pixels apart. More
+    # iterations pick up those chained contacts and settle piles further.
+    # Returns the number of contacts resolved.
+    n = len(position)
+    resolved = 0
+    for _ in range(iterations):
+        # pairs not touching at the start of the pass wait for the next pass (or frame)
+        delta = position[i] - position[j]
+        dist = np.einsum("ij,ij->i", delta, delta)
+        remaining = np.flatnonzero((dist > 0) & (dist < (2 * BALL_RADIUS) ** 2))
+        if not len(remaining):
+            break
+        while len(remaining):
+            a, b = i[remaining], j[remaining]
+            first = np.full(n, len(i))
+            np.minimum.at(first, a, remaining)
+            np.minimum.at(first, b, remaining)
+            ready = (first[a] == remaining) & (first[b] == remaining)
+            a, b, remaining = a[ready], b[ready], remaining[~ready]
+
+            delta = position[a] - position[b]
+            dist = np.sqrt(np.einsum("ij,ij->i", delta, delta))
+            touching = np.flatnonzero((dist > 0) & (dist < 2 * BALL_RADIUS))
+            if not len(touching):
+                continue
+            a, b, delta, dist = a[touching], b[touching], delta[touching], dist[touching]
+            normal = delta / dist[:, None]
+            v1 = np.einsum("ij,ij->i", velocity[a], normal)
+            v2 = np.einsum("ij,ij->i", velocity[b], normal)
+            # pairs already moving apart are left alone
+            closing = v1 - v2 <= 0
+            a, b, normal, dist = a[closing], b[closing], normal[closing], dist[closing]
+            impulse = (v2 - v1)[closing, None] * normal
+            velocity[a] += impulse
+            velocity[b] -= impulse
+            push = ((2 * BALL_RADIUS - dist + 0.01) / 2)[:, None] * normal
+            position[a] += push
+            position[b] -= push
+            resolved += len(a)
+    return resolved
+
+
+class BallSystem:
+    # Every ball in one set of arrays instead of one Ball object each: row i of position, velocity,
+    # color, alive and is_in is ball i, and the first count rows are in use. A frame is a few
+    # whole-array operations, in the same order the per-ball loop did them. Velocities, gravity and
+    # spinning_speed are per physics step (one 60 Hz frame of the original loop).
+    # With sleep_steps set, a ball that stays within sleep_distance of where it was for that many steps
+    # (its velocity averaged over the steps is tiny, however much it jitters) goes to sleep: it is not
+    # moved and only takes part in collisions with balls that are awake. It wakes when a collision or
+    # a touching ball moves it faster than wake_speed, or when the gap comes past it.
+    # Balls only go to sleep together, once RESTING of them stayed put: with fewer sleepers the
+    # bookkeeping costs more than the skipped work saves, so all that is left then is settle().
+    def __init__(self, center, ring_radius, gravity=0.2, loss_energy=0.95, friction=0.1, spinning_speed=0.01,
+                 capacity=64, sleep_steps=0, sleep_distance=6.0, wake_speed=2.0, swept=True, seed=None):
+        self.center = np.asarray(center, dtype=np.float64)
+        self.ring_radius = ring_radius
+        self.gravity = gravity
+        self.loss_energy = loss_energy
+        self.friction = friction
+        self.spinning_speed = spinning_speed
+        self.random = random.Random(seed)  # colours and respawn velocities, seeded for repeatable runs
+        self.swept = swept  # find where each ball met the wall during the step instead of testing its end point
+        self.impacts = NO_IMPACTS  # speeds of the wall bounces in the last advance()
+        # None, or an array advance() adds its seconds to: in collide(), integrate(), wall() and in all of it
+        self.timings = None
+        self.count = 0
+        self.position = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.color = np.zeros((capacity, 3), dtype=np.uint8)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.is_in = np.zeros(capacity, dtype=bool)  # False once the ball went through the gap
+        self.previous = np.zeros((capacity, 2))  # positions before the last advance(), for drawing between steps
+        self.sleep_steps = sleep_steps  # 0 keeps every ball awake
+        self.sleep_distance = sleep_distance
+        self.wake_speed = wake_speed
+        self.still = np.zeros(capacity, dtype=np.int32)  # steps spent within sleep_distance of anchor
+        self.anchor = np.zeros((capacity, 2))
+        self.sleeping = np.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def sleeping_count(self):
+        return int(np.count_nonzero(self.sleeping[:self.count]))
+
+    @property
+    def active_count(self):
+        return self.count - self.sleeping_count
+
+    def grow(self, capacity):
+        for name in ("position", "velocity", "color", "alive", "is_in", "previous", "still", "anchor", "sleeping"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add(self, position, velocity, color=None):
+        if self.count == len(self.position):
+            self.grow(2 * len(self.position))
+        i = self.count
+        self.position[i] = position
+        self.previous[i] = position
+        self.velocity[i] = velocity
+        self.color[i] = color if color is not None else self.random.choice(BALL_COLORS)
+        self.alive[i] = True
+        self.is_in[i] = True
+        self.still[i] = 0
+        self.anchor[i] = position
+        self.sleeping[i] = False
+        self.count += 1
+        return i
+
+    def clear(self):
+        self.count = 0
+
+    def compact(self):
+        # Drop the dead balls, keeping the others in order
+        n = self.count
+        keep = np.flatnonzero(self.alive[:n])
+        if len(keep) < n:
+            for array in (self.position, self.velocity, self.color, self.alive, self.is_in, self.previous,
+                          self.still, self.anchor, self.sleeping):
+                array[:len(keep)] = array[keep]
+            self.count = len(keep)
+
+    def outside(self, width, height):
+        # Balls that left the window
+        p = self.position[:self.count]
+        return (p[:, 1] > height) | (p[:, 0] < 0) | (p[:, 0] > width) | (p[:, 1] < 0)
+
+    def respawn(self, escaped, spawn):
+        # Every escaped ball is replaced by two new balls at spawn, added at the end like the list version
+        escaped = np.flatnonzero(escaped)
+        self.alive[escaped] = False
+        self.compact()
+        for _ in escaped:
+            self.add(spawn, [self.random.uniform(-2,2), self.random.uniform(-1,1)])
+            self.add(spawn, [self.random.uniform(-2,2), self.random.uniform(-1,1)])
+        return len(escaped)
+
+    def collide(self, iterations=1):
+        # Resolve every contact the broad phase finds with whole-array passes
+        n = self.count
+        asleep = np.count_nonzero(self.sleeping[:n]) if self.sleep_steps else 0
+        if not asleep:
+            i, j = candidate_pairs(self.position[:n])
+            return resolve_pairs(self.position[:n], self.velocity[:n], i, j, iterations)
+        sleeping = self.sleeping[:n].copy()
+        if asleep < SLEEPY * n:
+            # with few sleepers the plain broad phase is cheaper than the masked one, which looks at
+            # every neighbour of every awake ball; the same pairs once those of two sleepers are dropped
+            i, j = candidate_pairs(self.position[:n])
+            keep = ~(sleeping[i] & sleeping[j])
+            i, j = i[keep], j[keep]
+        else:
+            i, j = candidate_pairs(self.position[:n], active=~sleeping)
+        resolved = resolve_pairs(self.position[:n], self.velocity[:n], i, j, iterations)
+        self.wake_touched(i, j, sleeping)
+        return resolved
+
+    def wake_touched(self, i, j, sleeping):
+        # Wake sleepers the collisions pushed hard enough, or that touch a fast ball; the others stay put.
+        # A sleeper's velocity only changes in a pair with an awake ball, so only those pairs are looked at
+        first_asleep = sleeping[i]
+        sleeper = np.where(first_asleep, i, j)[first_asleep | sleeping[j]]
+        if not len(sleeper):
+            return
+        other = np.where(first_asleep, j, i)[first_asleep | sleeping[j]]
+        position, velocity = self.position, self.velocity
+        limit = self.wake_speed ** 2
+        delta = position[sleeper] - position[other]
+        touching = np.einsum("ij,ij->i", delta, delta) < (2 * BALL_RADIUS + 1) ** 2
+        pushed = np.einsum("ij,ij->i", velocity[sleeper], velocity[sleeper]) > limit
+        fast = np.einsum("ij,ij->i", velocity[other], velocity[other]) > limit
+        woken = pushed | touching & fast
+        self.wake(sleeper[woken])
+        velocity[sleeper[~np.isin(sleeper, sleeper[woken])]] = 0
+
+    def wake(self, balls):
+        # Wake the balls and, like an island, every sleeper resting on them directly or through other
+        # sleepers: a pile left asleep after the balls holding it up fell away would float in the air
+        n = self.count
+        sleeping = self.sleeping[:n]
+        frontier = np.zeros(n, dtype=bool)
+        frontier[balls] = sleeping[balls]
+        if not frontier.any():
+            return
+        # the island only spreads over sleepers, so their touching pairs are found once, among them only
+        asleep = np.flatnonzero(sleeping)
+        i, j = candidate_pairs(self.position[asleep])
+        delta = self.position[asleep[i]] - self.position[asleep[j]]
+        touching = np.einsum("ij,ij->i", delta, delta) < (2 * BALL_RADIUS + 1) ** 2
+        i, j = asleep[i[touching]], asleep[j[touching]]
+        while frontier.any():
+            sleeping &= ~frontier
+            self.still[:n][frontier] = 0
+            self.anchor[:n][frontier] = self.position[:n][frontier]
+            reached = np.zeros(n, dtype=bool)
+            reached[j[frontier[i]]] = True
+            reached[i[frontier[j]]] = True
+            frontier = reached & sleeping
+
+    def wake_in_gap(self, start_angle, end_angle):
+        # Sleepers resting against the ring where the gap has come round, or against its ends where
+        # they could still roll out
+        asleep = np.flatnonzero(self.sleeping[:self.count])
+        d = self.position[asleep] - self.center
+        near = np.sqrt(np.einsum("ij,ij->i", d, d)) + 2 * BALL_RADIUS > self.ring_radius
+        asleep = asleep[near]
+        if len(asleep):
+            margin = 2 * BALL_RADIUS / self.ring_radius
+            self.wake(asleep[balls_in_arc(self.position[asleep], self.center, start_angle - margin, end_angle + margin)])
+
+    def advance(self, start_angle, end_angle, substeps=1):
+        # One physics step split into substeps of collisions, integration and the ring, with the gap
+        # turning through the step to end at start_angle, end_angle. Returns the wall hits; the speed
+        # of every bounce off the wall during the step is left in impacts
+        timings = self.timings
+        if timings is not None:
+            start = time.perf_counter()
+        self.previous[:self.count] = self.position[:self.count]
+        dt = 1 / substeps
+        hits = 0
+        impacts = []
+        for k in range(substeps):
+            behind = self.spinning_speed * (substeps - 1 - k) * dt
+            if timings is None:
+                self.collide()
+            else:
+                begin = time.perf_counter()
+                self.collide()
+                timings[0] += time.perf_counter() - begin
+            hits += self.step(start_angle - behind, end_angle - behind, dt)
+            impacts.append(self.impacts)
+        self.impacts = np.concatenate(impacts)
+        if self.sleep_steps:
+            self.settle()
+        if timings is not None:
+            timings[3] += time.perf_counter() - start
+        return hits
+
+    def interpolated(self, alpha):
+        # Positions alpha of the way from the previous step to the current one
+        previous, position = self.previous[:self.count], self.position[:self.count]
+        return previous + (position - previous) * alpha
+
+    def step(self, start_angle, end_angle, dt=1.0):
+        # Gravity, integration over dt physics steps and the ring for every ball that is awake.
+        # Returns how many balls hit the wall (the ones that played the bounce sound)
+        n = self.count
+        awake = None
+        if self.sleep_steps and self.sleeping[:n].any():
+            self.wake_in_gap(start_angle, end_angle)
+            awake = np.flatnonzero(~self.sleeping[:n])
+        if awake is None:
+            position, velocity, is_in = self.position[:n], self.velocity[:n], self.is_in[:n]
+        else:
+            position, velocity, is_in = self.position[awake], self.velocity[awake], self.is_in[awake]
+
+        hits = self.ring(position, velocity, is_in, start_angle, end_angle, dt)
+        if awake is not None:
+            self.position[awake], self.velocity[awake], self.is_in[awake] = position, velocity, is_in
+        return hits
+
+    def settle(self):
+        # Once per physics step: count the steps each awake ball has stayed near its anchor and put
+        # the ones that stayed long enough to sleep. A ball in flight is never that slow for long,
+        # gravity alone takes it past sleep_distance within a few steps of the top of its arc
+        awake = np.flatnonzero(~self.sleeping[:self.count])
+        position = self.position[awake]
+        moved = position - self.anchor[awake]
+        away = np.einsum("ij,ij->i", moved, moved) > self.sleep_distance ** 2
+        still = np.where(away, 0, self.still[awake] + 1)
+        self.still[awake] = still
+        self.anchor[awake[away]] = position[away]
+        tired = awake[still >= self.sleep_steps]
+        n = self.count
+        asleep = n - len(awake)
+        if asleep + len(tired) < (RESTING / 2 if asleep else RESTING) * n:
+            if asleep:
+                # most of the pile has woken up, the last sleepers would only cost: wake them all
+                sleepers = self.sleeping[:n].copy()
+                self.sleeping[:n] = False
+                self.still[:n][sleepers] = 0
+                self.anchor[:n][sleepers] = self.position[:n][sleepers]
+            return
+        self.sleeping[tired] = True
+        self.velocity[tired] = 0
+
+    def ring(self, position, velocity, is_in, start_angle, end_angle, dt):
+        # step() on the given rows, in place
+        if self.timings is None:
+            self.integrate(position, velocity, dt)
+            return self.wall(position, velocity, is_in, start_angle, end_angle, dt)
+        start = time.perf_counter()
+        self.integrate(position, velocity, dt)
+        middle = time.perf_counter()
+        hits = self.wall(position, velocity, is_in, start_angle, end_angle, dt)
+        self.timings[1:3] += (middle - start, time.perf_counter() - middle)
+        return hits
+
+    def integrate(self, position, velocity, dt):
+        velocity[:, 1] += self.gravity * dt
+        position += velocity * dt
+
+    def wall(self, position, velocity, is_in, start_angle, end_angle, dt):
+        # Bounce the given rows, just integrated over dt, off the ring or let them out through the gap.
+        # With swept set the wall and the gap are checked where and when each ball actually reached
+        # the wall on its way through the step, not at the end
+        d = position - self.center
+        dist = np.sqrt(d[:, 0] ** 2 + d[:, 1] ** 2)
+        touching = dist + BALL_RADIUS > self.ring_radius
+        self.impacts = NO_IMPACTS
+        if not touching.any():
+            return 0
+        in_arc = balls_in_arc(position, self.center, start_angle, end_angle)
+        if self.swept:
+            wall = np.flatnonzero(touching & is_in)
+            contact, late = self.contact(position[wall], velocity[wall] * dt)
+            # the gap as it was at the moment of contact, dt * late of a step before start_angle
+            in_arc[wall] = balls_in_arc(self.turn(contact, self.spinning_speed * dt * late),
+                                        self.center, start_angle, end_angle)
+        is_in[touching & in_arc] = False
+        hits = np.count_nonzero(touching & ~in_arc)
+
+        bounce = np.flatnonzero(touching & is_in)
+        if len(bounce):
+            if self.swept:
+                keep = is_in[wall]
+                d, late = contact[keep] - self.center, late[keep]
+            else:
+                d = d[bounce]
+            unit = d / np.sqrt(np.einsum("ij,ij->i", d, d))[:, None]
+            position[bounce] = self.center + (self.ring_radius - BALL_RADIUS) * unit
+            # reflect about the tangent, lose some energy, and pick up a little of the ring's spin
+            t = np.column_stack((-d[:, 1], d[:, 0]))
+            v = velocity[bounce]
+            self.impacts = np.abs(np.einsum("ij,ij->i", v, unit))  # speed into the wall
+            proj = (np.einsum("ij,ij->i", v, t) / np.einsum("ij,ij->i", t, t))[:, None] * t
+            velocity[bounce] = (2 * proj - v) * self.loss_energy + t * self.spinning_speed * self.friction
+            if self.swept:
+                # the rest of the step after the bounce, kept inside the wall
+                moved = position[bounce] + velocity[bounce] * (dt * late[:, None])
+                d = moved - self.center
+                dist = np.sqrt(np.einsum("ij,ij->i", d, d))
+                over = dist > self.ring_radius - BALL_RADIUS
+                moved[over] = self.center + (self.ring_radius - BALL_RADIUS) * d[over] / dist[over, None]
+                position[bounce] = moved
+        return hits
+
+    def contact(self, end, move):
+        # Where the balls that moved by move to end first touched the wall, and the part of the step
+        # still left at that moment: the exit root of |start + s * move - center| = ring_radius - R.
+        # A ball that was already touching at the start of the step touched it there
+        start = end - move
+        d = start - self.center
+        a = np.einsum("ij,ij->i", move, move)
+        b = np.einsum("ij,ij->i", d, move)
+        c = np.einsum("ij,ij->i", d, d) - (self.ring_radius - BALL_RADIUS) ** 2
+        s = np.zeros(len(end))
+        inside = (c < 0) & (a > 0)
+        s[inside] = (-b[inside] + np.sqrt(b[inside] ** 2 - a[inside] * c[inside])) / a[inside]
+        s = np.clip(s, 0.0, 1.0)
+        return start + move * s[:, None], 1.0 - s
+
+    def turn(self, points, angle):
+        # points turned about the centre by angle (one per point), in the direction the ring spins
+        d = points - self.center
+        cos, sin = np.cos(angle), np.sin(angle)
+        return self.center + np.column_stack((d[:, 0] * cos - d[:, 1] * sin, d[:, 0] * sin + d[:, 1] * cos))
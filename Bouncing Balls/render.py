@@ -0,0 +1,92 @@
+import math
+
+import numpy as np
+import pygame
+
+from physics import BALL_RADIUS
+
+GAP_STEPS = 360  # gap overlays per turn of the ring, made the first time each angle is drawn
+GAP_PAD = 2  # pixels the overlay reaches past the ring line on each side
+
+
+def draw_arc(window, center, radius, start_angle, end_angle, color=(0, 0, 0)):
+    # The original gap: a big triangle from the centre over the ring, redrawn every frame
+    p1 = center + (radius + 1000) * np.array([math.cos(start_angle), math.sin(start_angle)])
+    p2 = center + (radius + 1000) * np.array([math.cos(end_angle), math.sin(end_angle)])
+    pygame.draw.polygon(window, color, [center, p1, p2], 0)
+
+
+class Renderer:
+    # Draws a frame from surfaces made once: the ring on the background, one small sprite per ball
+    # colour blitted in a single blits() call, and the gap as a thin overlay that only covers the
+    # part of the ring it hides, rotated once per angle step and cached.
+    def __init__(self, size, center, ring_radius, arc_degrees, ring_color, background=(0, 0, 0), ring_width=3):
+        self.center = np.asarray(center, dtype=np.float64)
+        self.ring_radius = ring_radius
+        self.background_color = background
+        self.background = pygame.Surface(size)
+        self.background.fill(background)
+        pygame.draw.circle(self.background, ring_color, self.center, ring_radius, ring_width)
+        self.sprites = {}  # 0xRRGGBB -> ball surface
+        self.ball_colors = None  # colors of the balls drawn last, ball_sprites is their sprites in order
+        self.ball_sprites = []
+        self.gap, self.gap_offset = self.gap_overlay(math.radians(arc_degrees), ring_width)
+        self.gaps = {}  # angle step -> (rotated overlay, its top-left offset from the centre)
+        # fblits (pygame-ce) skips building the list of dirty rects blits() would return
+        self.blits = getattr(pygame.Surface, "fblits", None) or \
+            (lambda surface, batch: surface.blits(batch, doreturn=False))
+
+    def gap_overlay(self, arc, ring_width):
+        # The ring band between -arc/2 and arc/2 in background colour, on a transparent surface just
+        # big enough for it; returns it and how far its centre is from the ring's centre
+        inner = self.ring_radius - ring_width - GAP_PAD
+        outer = self.ring_radius + GAP_PAD
+        angles = np.linspace(-arc / 2, arc / 2, max(8, int(math.degrees(arc))))
+        points = np.concatenate((outer * np.column_stack((np.cos(angles), np.sin(angles))),
+                                 inner * np.column_stack((np.cos(angles[::-1]), np.sin(angles[::-1])))))
+        left, right = math.floor(points[:, 0].min()), math.ceil(points[:, 0].max())
+        half = math.ceil(np.abs(points[:, 1]).max())
+        key = (255, 0, 255) if self.background_color != (255, 0, 255) else (0, 255, 0)
+        overlay = pygame.Surface((right - left + 1, 2 * half + 1))
+        overlay.fill(key)
+        pygame.draw.polygon(overlay, self.background_color, (points - (left, -half)).tolist())
+        overlay.set_colorkey(key, pygame.RLEACCEL)
+        return overlay, (left + right) / 2
+
+    def draw(self, window, start_angle, end_angle, positions, colors):
+        window.blit(self.background, (0, 0))
+        self.draw_gap(window, (start_angle + end_angle) / 2)
+        self.draw_balls(window, positions, colors)
+
+    def draw_gap(self, window, angle):
+        step = round(angle / (2 * math.pi) * GAP_STEPS) % GAP_STEPS
+        if step not in self.gaps:
+            angle = step * 2 * math.pi / GAP_STEPS
+            # transform.rotate turns counterclockwise on screen, ring angles go clockwise (y is down)
+            rotated = pygame.transform.rotate(self.gap, -math.degrees(angle))
+            middle = self.gap_offset * np.array([math.cos(angle), math.sin(angle)])
+            self.gaps[step] = rotated, middle - np.array(rotated.get_size()) / 2
+        overlay, offset = self.gaps[step]
+        window.blit(overlay, (self.center + offset).round())
+
+    def draw_balls(self, window, positions, colors):
+        colors = np.asarray(colors)
+        if self.ball_colors is None or not np.array_equal(colors, self.ball_colors):
+            # colours change only when balls come and go, so which sprite each ball uses is kept
+            self.ball_colors = colors.copy()
+            packed = colors.astype(np.int64)
+            keys = ((packed[:, 0] << 16) | (packed[:, 1] << 8) | packed[:, 2]).tolist()
+            for key in set(keys) - self.sprites.keys():
+                self.sprites[key] = self.sprite(key)
+            self.ball_sprites = [self.sprites[key] for key in keys]
+        x, y = (np.rint(positions).astype(np.int64) - BALL_RADIUS).T.tolist()
+        self.blits(window, list(zip(self.ball_sprites, zip(x, y))))
+
+    def sprite(self, key):
+        color = (key >> 16, (key >> 8) & 255, key & 255)
+        transparent = (0, 0, 0) if color != (0, 0, 0) else (255, 255, 255)
+        sprite = pygame.Surface((2 * BALL_RADIUS + 1, 2 * BALL_RADIUS + 1))
+        sprite.fill(transparent)
+        pygame.draw.circle(sprite, color, (BALL_RADIUS, BALL_RADIUS), BALL_RADIUS)
+        sprite.set_colorkey(transparent, pygame.RLEACCEL)
+        return sprite
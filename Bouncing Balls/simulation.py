@@ -0,0 +1,163 @@
+import argparse
+import hashlib
+import math
+import time
+
+import numpy as np
+
+from physics import BALL_RADIUS, BallSystem
+
+# the game's world; lengths in pixels, speeds per physics step (60 steps per second)
+WIDTH = 600
+HEIGHT = 600
+CENTER = (WIDTH / 2, HEIGHT / 2)
+RING_RADIUS = WIDTH / 3
+ARC_DEGREES = 60
+SPINNING_SPEED = 0.01
+FRICTION = 0.1
+LOSS_ENERGY = 0.95
+GRAVITY = 0.2
+SUBSTEPS = 2  # collision passes per physics step, more keep fast balls from passing through each other
+SLEEP_STEPS = 30  # physics steps a ball must stay put before it may sleep and be skipped by the physics
+SLEEP_DISTANCE = 6.0  # pixels a ball may jitter and still count as staying put
+WAKE_SPEED = 2.0  # a hit faster than this wakes a sleeping ball
+MAX_BALLS = 50  # more balls than this and the game is over
+
+
+def ring_of_balls(n, seed=0):
+    # n balls at the game's density in a ring just big enough to hold them, as in bench_broadphase
+    rng = np.random.default_rng(seed)
+    ring_radius = 200 * np.sqrt(n / 800) + 2 * BALL_RADIUS
+    center = np.array([ring_radius + 50, ring_radius + 50])
+    angle = rng.uniform(0, 2 * np.pi, n)
+    dist = (ring_radius - 2 * BALL_RADIUS) * np.sqrt(rng.random(n))
+    positions = center + np.column_stack((dist * np.cos(angle), dist * np.sin(angle)))
+    return center, ring_radius, positions, rng.uniform(-2, 2, (n, 2))
+
+
+class Simulation:
+    # The game's physics without a window, clock or sound: the ring turns by SPINNING_SPEED every
+    # step, escaped balls respawn as two new ones (or are just dropped with respawn=False) and
+    # everything random comes from seed, so the same arguments give the same run.
+    # The first ball starts at rest at the spawn point as in the game; with more balls the others are
+    # scattered over the ring, which grows past the game's when they would not fit.
+    # With record set every step adds to the statistics stats() returns.
+    def __init__(self, balls=1, seed=None, respawn=True, substeps=SUBSTEPS, sleep_steps=SLEEP_STEPS, record=False,
+                 arc_degrees=ARC_DEGREES):
+        center, ring_radius, positions, velocities = ring_of_balls(balls - 1, seed)
+        if ring_radius <= RING_RADIUS:
+            positions += np.asarray(CENTER) - center
+            center, ring_radius = np.asarray(CENTER, dtype=np.float64), RING_RADIUS
+        self.center = center
+        self.ring_radius = ring_radius
+        self.size = (2 * center[0], 2 * center[1])
+        self.spawn = center - (0, ring_radius / 2)  # new balls appear here, the first one at rest
+        self.respawn = respawn
+        self.substeps = substeps
+        self.arc_degrees = arc_degrees  # 0 closes the ring
+        self.seed = seed
+        self.balls = BallSystem(center, ring_radius, GRAVITY, LOSS_ENERGY, FRICTION, SPINNING_SPEED,
+                                capacity=max(64, 2 * balls), sleep_steps=sleep_steps,
+                                sleep_distance=SLEEP_DISTANCE, wake_speed=WAKE_SPEED, seed=seed)
+        self.record = record
+        self.reset(positions, velocities)
+
+    def reset(self, positions=(), velocities=()):
+        self.balls.clear()
+        self.balls.add(self.spawn, (0, 0))
+        for position, velocity in zip(positions, velocities):
+            self.balls.add(position, velocity)
+        self.start_angle = math.radians(-self.arc_degrees / 2)
+        self.end_angle = math.radians(self.arc_degrees / 2)
+        self.steps = 0
+        self.escaped = 0
+        self.hits = 0
+        self.bounces = 0
+        self.hardest = 0.0
+        self.counts, self.speeds, self.energies = [], [], []
+
+    def __len__(self):
+        return len(self.balls)
+
+    def step(self):
+        # One physics step of the game. Returns the wall hits
+        self.start_angle += SPINNING_SPEED
+        self.end_angle += SPINNING_SPEED
+        balls = self.balls
+        escaped = balls.outside(*self.size)
+        if self.respawn:
+            self.escaped += balls.respawn(escaped, self.spawn)
+        elif escaped.any():
+            self.escaped += np.count_nonzero(escaped)
+            balls.alive[:balls.count] &= ~escaped
+            balls.compact()
+        hits = balls.advance(self.start_angle, self.end_angle, self.substeps)
+        self.steps += 1
+        if self.record:
+            self.hits += hits
+            self.bounces += len(balls.impacts)
+            if len(balls.impacts):
+                self.hardest = max(self.hardest, float(balls.impacts.max()))
+            v = balls.velocity[:balls.count]
+            speed2 = np.einsum("ij,ij->i", v, v)
+            height = self.size[1] - balls.position[:balls.count, 1]
+            self.counts.append(balls.count)
+            self.speeds.append(float(np.sqrt(speed2).mean()) if balls.count else 0.0)
+            self.energies.append(float((0.5 * speed2 + GRAVITY * height).sum()))
+        return hits
+
+    def run(self, steps, max_balls=None):
+        # Step until steps were run or there are more than max_balls; returns the steps per second of this call
+        start = time.perf_counter()
+        first = self.steps
+        for _ in range(steps):
+            if max_balls is not None and len(self.balls) > max_balls:
+                break
+            self.step()
+        elapsed = time.perf_counter() - start
+        return (self.steps - first) / elapsed if elapsed > 0 else 0.0
+
+    def digest(self):
+        # Short hash of every position and velocity, equal for two runs only if they went the same way
+        n = self.balls.count
+        state = np.concatenate((self.balls.position[:n], self.balls.velocity[:n]))
+        return hashlib.sha1(np.ascontiguousarray(state).tobytes()).hexdigest()[:12]
+
+    def stats(self):
+        counts = np.array(self.counts or [len(self.balls)])
+        return {
+            "seed": self.seed,
+            "steps": self.steps,
+            "balls": len(self.balls),
+            "balls min/mean/max": (int(counts.min()), float(counts.mean()), int(counts.max())),
+            "escaped": self.escaped,
+            "sleeping": self.balls.sleeping_count,
+            "wall hits": self.hits,
+            "bounces": self.bounces,
+            "hardest bounce": self.hardest,
+            "mean speed": float(np.mean(self.speeds)) if self.speeds else 0.0,
+            "energy start/end": (self.energies[0], self.energies[-1]) if self.energies else (0.0, 0.0),
+            "digest": self.digest(),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Bouncing Balls physics headless")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--balls", type=int, default=1, help="balls at the start")
+    parser.add_argument("--steps", type=int, default=3600, help="physics steps, 60 per second of game time")
+    parser.add_argument("--max-balls", type=int, default=None, help="stop past this many balls, as the game does")
+    parser.add_argument("--no-respawn", action="store_true", help="drop escaped balls instead of respawning two")
+    parser.add_argument("--substeps", type=int, default=SUBSTEPS)
+    parser.add_argument("--sleep-steps", type=int, default=SLEEP_STEPS, help="0 keeps every ball awake")
+    args = parser.parse_args()
+
+    sim = Simulation(args.balls, args.seed, not args.no_respawn, args.substeps, args.sleep_steps, record=True)
+    rate = sim.run(args.steps, args.max_balls)
+    for name, value in sim.stats().items():
+        if isinstance(value, tuple):
+            value = " / ".join(f"{v:.1f}" if isinstance(v, float) else str(v) for v in value)
+        elif isinstance(value, float):
+            value = f"{value:.3f}"
+        print(f"{name:>18}: {value}")
+    print(f"{'steps/s':>18}: {rate:.0f}")
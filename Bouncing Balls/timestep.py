@@ -0,0 +1,39 @@
+import time
+
+
+class FixedStep:
+    # Runs the physics in steps of step_time seconds of real time, however long frames take.
+    # advance() banks the frame's time and steps() yields once per whole step banked, stopping
+    # early once the frame's physics budget is spent; what is left waits for the next frame.
+    # Backlog past max_backlog is dropped, so a long stall slows the game down instead of
+    # freezing it while it catches up.
+    def __init__(self, step_time=1 / 60, budget=0.010, max_backlog=0.25):
+        self.step_time = step_time
+        self.budget = budget
+        self.max_backlog = max_backlog
+        self.accumulator = 0.0
+        self.late = False  # steps were left over after the last steps(), the renderer may skip a frame
+        self.physics_time = 0.0  # seconds spent in the last steps()
+
+    def reset(self):
+        self.accumulator = 0.0
+        self.late = False
+
+    def advance(self, elapsed):
+        self.accumulator = min(self.accumulator + elapsed, self.max_backlog)
+
+    def steps(self):
+        start = time.perf_counter()
+        while self.accumulator >= self.step_time:
+            yield
+            self.accumulator -= self.step_time
+            self.physics_time = time.perf_counter() - start
+            if self.physics_time > self.budget:
+                break
+        self.physics_time = time.perf_counter() - start
+        self.late = self.accumulator >= self.step_time
+
+    @property
+    def alpha(self):
+        # How far real time is between the last step and the next one, for drawing in between
+        return min(self.accumulator / self.step_time, 1.0)
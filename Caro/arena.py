@@ -0,0 +1,122 @@
+import argparse
+import json
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from board import CaroBoard
+from engine import Engine
+
+engines = {}  # engine config -> Engine, one set per worker process for the book's analysis jobs
+
+
+def get_engine(config):
+    key = json.dumps(config, sort_keys=True)
+    if key not in engines:
+        engines[key] = Engine(**config)
+    return engines[key]
+
+
+def random_opening(rows, cols, moves, seed):
+    # A few random moves near the centre so paired games do not all repeat the same line
+    rng = random.Random(seed)
+    centre = [(r, c) for r in range(rows // 2 - 2, rows // 2 + 3) for c in range(cols // 2 - 2, cols // 2 + 3)]
+    return rng.sample(centre, moves)
+
+
+def play_game(job):
+    # One game between config_a and config_b, returns A's score and node counts per side
+    config_a, config_b, rows, cols, opening, a_first = job
+    board = CaroBoard(rows, cols)
+    for move in opening:
+        board.push(move)
+    player = 1 if len(board.stack) % 2 == 0 else 2
+    a_player = player if a_first else 3 - player
+    # new engines every game: a table, history and killers left from the worker's last game would
+    # make the result depend on how the games were shared out between the workers
+    engines = {a_player: Engine(**config_a), 3 - a_player: Engine(**config_b)}
+    nodes = {1: 0, 2: 0}
+    moves = {1: 0, 2: 0}
+    while not board.winner and len(board.stack) < rows * cols:
+        engine = engines[player]
+        move = engine.best_move(board, player)
+        if move is None:
+            break
+        board.push(move)
+        nodes[player] += engine.nodes
+        moves[player] += 1
+        player = 3 - player
+    if board.winner == 0:
+        score = 0.5
+    else:
+        score = 1.0 if board.winner == a_player else 0.0
+    b_player = 3 - a_player
+    return score, nodes[a_player], moves[a_player], nodes[b_player], moves[b_player], len(board.stack)
+
+
+def elo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def wilson(score, n, z=1.96):
+    # Wilson score interval of a mean score over n games; unlike the normal approximation it does
+    # not shrink to a point when every game ended the same way
+    if n == 0:
+        return 0.0, 1.0
+    z2 = z * z / n
+    centre = (score + z2 / 2) / (1 + z2)
+    half = z * math.sqrt(score * (1 - score) / n + z2 / (4 * n)) / (1 + z2)
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+def run_arena(config_a, config_b, games=100, workers=None, rows=15, cols=15, opening_moves=2, seed=0):
+    # Every opening is played twice with colours swapped
+    jobs = []
+    for g in range(games):
+        opening = random_opening(rows, cols, opening_moves, seed + g // 2)
+        jobs.append((config_a, config_b, rows, cols, opening, g % 2 == 0))
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(workers) as pool:
+        results = list(pool.map(play_game, jobs, chunksize=max(1, games // 64)))
+    elapsed = time.perf_counter() - start
+
+    scores = [r[0] for r in results]
+    mean = sum(scores) / len(scores)
+    low, high = wilson(mean, len(scores))
+    return {
+        "games": len(results),
+        "wins": scores.count(1.0),
+        "draws": scores.count(0.5),
+        "losses": scores.count(0.0),
+        "score": mean,
+        "elo": elo(mean),
+        "elo_low": elo(low),
+        "elo_high": elo(high),
+        "games_per_sec": len(results) / elapsed,
+        "nodes_per_move_a": sum(r[1] for r in results) / max(1, sum(r[2] for r in results)),
+        "nodes_per_move_b": sum(r[3] for r in results) / max(1, sum(r[4] for r in results)),
+        "moves_per_game": sum(r[5] for r in results) / len(results),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless Caro self-play between two engine configs")
+    parser.add_argument("--a", default='{"time_limit": null, "max_nodes": 2000}', help="Engine kwargs as JSON")
+    parser.add_argument("--b", default='{"time_limit": null, "max_nodes": 1000}', help="Engine kwargs as JSON")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--size", type=int, default=15)
+    parser.add_argument("--opening-moves", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    result = run_arena(json.loads(args.a), json.loads(args.b), args.games, args.workers,
+                       args.size, args.size, args.opening_moves, args.seed)
+    print(f"A vs B: +{result['wins']} ={result['draws']} -{result['losses']} "
+          f"score {result['score']:.3f}")
+    print(f"Elo A - B: {result['elo']:+.0f} (95% {result['elo_low']:+.0f} .. {result['elo_high']:+.0f})")
+    print(f"{result['games_per_sec']:.2f} games/s, {result['moves_per_game']:.1f} moves/game, "
+          f"nodes/move A {result['nodes_per_move_a']:.0f} B {result['nodes_per_move_b']:.0f}")
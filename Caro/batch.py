@@ -0,0 +1,31 @@
+import numpy as np
+
+from board import WIN_LENGTH
+
+
+def lines_of(mask, k):
+    # (N, rows, cols) bool -> True where k in a row starts, for row, column, diagonal, anti-diagonal
+    rows, cols = mask.shape[1:]
+    h = mask[:, :, :cols - k + 1].copy()
+    v = mask[:, :rows - k + 1, :].copy()
+    d = mask[:, :rows - k + 1, :cols - k + 1].copy()
+    a = mask[:, k - 1:, :cols - k + 1].copy()
+    for i in range(1, k):
+        h &= mask[:, :, i:cols - k + 1 + i]
+        v &= mask[:, i:rows - k + 1 + i, :]
+        d &= mask[:, i:rows - k + 1 + i, i:cols - k + 1 + i]
+        a &= mask[:, k - 1 - i:rows - i, i:cols - k + 1 + i]
+    return h, v, d, a
+
+
+def batch_winners(cells, k=WIN_LENGTH):
+    # Winner of every board in a stacked (N, rows, cols) array like CaroBoard.cells: 0, 1 or 2.
+    # A board where both players have k in a row reports 1.
+    cells = np.asarray(cells)
+    winners = np.zeros(cells.shape[0], dtype=np.int8)
+    for player in (2, 1):
+        found = np.zeros(cells.shape[0], dtype=bool)
+        for lines in lines_of(cells == player, k):
+            found |= lines.reshape(len(lines), -1).any(axis=1)
+        winners[found] = player
+    return winners
@@ -0,0 +1,38 @@
+import time
+
+import numpy as np
+
+from batch import batch_winners
+from board import CaroBoard
+
+
+def random_boards(n, rows, cols, stones, seed=0):
+    # n boards with the given number of stones each, X and O alternating
+    rng = np.random.default_rng(seed)
+    cells = np.zeros((n, rows * cols), dtype=int)
+    order = rng.random((n, rows * cols)).argsort(axis=1)[:, :stones]
+    players = np.where(np.arange(stones) % 2 == 0, 1, 2)
+    np.put_along_axis(cells, order, players, axis=1)
+    return cells.reshape(n, rows, cols)
+
+
+for size in (15, 19):
+    cells = random_boards(10000, size, size, size * size // 4)
+
+    start = time.perf_counter()
+    winners = batch_winners(cells)
+    t_batch = time.perf_counter() - start
+
+    loop = 500
+    board = CaroBoard(size, size)
+    start = time.perf_counter()
+    expected = []
+    for b in cells[:loop]:
+        board.cells = b
+        expected.append(board.check_winner())
+    t_loop = time.perf_counter() - start
+    assert list(winners[:loop]) == expected
+
+    print(f"{size}x{size}: batch_winners {len(cells) / t_batch:10.0f} boards/s | "
+          f"check_winner loop {loop / t_loop:7.0f} boards/s ({len(cells) / t_batch / (loop / t_loop):.0f}x), "
+          f"{np.count_nonzero(winners)} of {len(cells)} boards won")
@@ -0,0 +1,37 @@
+import random
+import timeit
+
+from board import CaroBoard
+from bitboard import BitBoard
+
+
+def random_position(rows, cols, moves, seed=0):
+    # Same random moves on both boards, stopping before anyone wins
+    rng = random.Random(seed)
+    cells = [(r, c) for r in range(rows) for c in range(cols)]
+    rng.shuffle(cells)
+    board = CaroBoard(rows, cols)
+    bits = BitBoard(rows, cols)
+    player = 1
+    for r, c in cells[:moves]:
+        bits.place_move(r, c, player)
+        if bits.winner:
+            bits.stones[player] ^= bits.bit(r, c)
+            bits.winner = 0
+            break
+        board.place_move(r, c, player)
+        player = 2 if player == 1 else 1
+    return board, bits
+
+
+for size in (15, 19):
+    board, bits = random_position(size, size, size * size // 3)
+    assert board.check_winner() == bits.check_winner()
+    n = 200
+    t_scan = timeit.timeit(board.check_winner, number=n) / n
+    t_bits = timeit.timeit(bits.check_winner, number=n) / n
+    t_four = timeit.timeit(lambda: bits.count_open_fours(1), number=n) / n
+    t_three = timeit.timeit(lambda: bits.count_open_threes(1), number=n) / n
+    print(f"{size}x{size}: check_winner {t_scan * 1e6:9.1f} us | "
+          f"BitBoard.check_winner {t_bits * 1e6:6.1f} us ({t_scan / t_bits:.0f}x) | "
+          f"open fours {t_four * 1e6:5.1f} us | open threes {t_three * 1e6:5.1f} us")
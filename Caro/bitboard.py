@@ -0,0 +1,105 @@
+import numpy as np
+
+
+class BitBoard:
+    # Same interface as CaroBoard (five in a row), but every player is one Python int.
+    # Cell (r, c) is bit r * (cols + 1) + c; the extra column per row stays empty
+    # so shifting a line never wraps onto the next row.
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.width = cols + 1
+        self.stones = [0, 0, 0]  # index 1: X, index 2: O
+        self.full = 0
+        for r in range(rows):
+            self.full |= ((1 << cols) - 1) << (r * self.width)
+        # bit shift for row, column, diagonal, anti-diagonal
+        self.shifts = (1, self.width, self.width + 1, self.width - 1)
+        self.winner = 0
+        self.stack = []  # (row, col, player, winner before the move)
+        self._cells = None
+
+    def bit(self, row, col):
+        return 1 << (row * self.width + col)
+
+    @property
+    def cells(self):
+        # numpy view for draw_board, rebuilt only after the board changed
+        if self._cells is None:
+            cells = np.zeros((self.rows, self.cols), dtype=int)
+            for player in (1, 2):
+                b = self.stones[player]
+                while b:
+                    low = b & -b
+                    r, c = divmod(low.bit_length() - 1, self.width)
+                    cells[r][c] = player
+                    b ^= low
+            self._cells = cells
+        return self._cells
+
+    def empty(self):
+        return self.full & ~(self.stones[1] | self.stones[2])
+
+    def place_move(self, row, col, player):
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            b = self.bit(row, col)
+            if not (self.stones[1] | self.stones[2]) & b:
+                self.stones[player] |= b
+                self._cells = None
+                self.stack.append((row, col, player, self.winner))
+                if self.has_five(player):
+                    self.winner = player
+                return True
+        return False
+
+    def push(self, move):
+        player = 1 if len(self.stack) % 2 == 0 else 2
+        return self.place_move(move[0], move[1], player)
+
+    def pop(self):
+        if not self.stack:
+            return None
+        row, col, player, self.winner = self.stack.pop()
+        self.stones[player] ^= self.bit(row, col)
+        self._cells = None
+        return row, col, player
+
+    def has_five(self, player):
+        b = self.stones[player]
+        for s in self.shifts:
+            m = b & (b >> s)          # 2 in a row
+            m &= m >> (2 * s)         # 4 in a row
+            if m & (b >> (4 * s)):    # 5 in a row
+                return True
+        return False
+
+    def check_winner(self):
+        for player in (1, 2):
+            if self.has_five(player):
+                return player
+        return 0
+
+    def count_open_fours(self, player):
+        # _XXXX_
+        b = self.stones[player]
+        e = self.empty()
+        count = 0
+        for s in self.shifts:
+            m = b & (b >> s)
+            m &= m >> (2 * s)
+            count += bin(m & (e << s) & (e >> (4 * s))).count("1")
+        return count
+
+    def count_open_threes(self, player):
+        # _XXX_, _X_XX_ and _XX_X_
+        b = self.stones[player]
+        e = self.empty()
+        count = 0
+        for s in self.shifts:
+            ends = (e << s)
+            count += bin(b & (b >> s) & (b >> (2 * s)) & ends & (e >> (3 * s))).count("1")
+            ends &= e >> (4 * s)
+            count += bin(b & (e >> s) & (b >> (2 * s)) & (b >> (3 * s)) & ends).count("1")
+            count += bin(b & (b >> s) & (e >> (2 * s)) & (b >> (3 * s)) & ends).count("1")
+        return count
+
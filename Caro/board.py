@@ -0,0 +1,171 @@
+import struct
+
+import numpy as np
+
+WIN_LENGTH = 5
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (-1, 1))  # row, column, diagonal, anti-diagonal
+
+# game record: magic, rows, cols, stones in a row to win, first player, number of moves, then one byte
+# (row * cols + col) per move. Records from before the win length was kept (magic CARO) are five in a row
+RECORD_MAGIC = b"CAR2"
+RECORD_HEADER = struct.Struct("<4sBBBBH")
+OLD_RECORD_MAGIC = b"CARO"
+OLD_RECORD_HEADER = struct.Struct("<4sBBBH")
+
+class CaroBoard:
+    def __init__(self, rows, cols, incremental=True, win_length=WIN_LENGTH):
+        self.rows = rows
+        self.cols = cols
+        self.win_length = win_length  # stones in a row needed to win, k of an m,n,k game
+        self.cells = np.zeros((rows, cols), dtype=int)  # 0: empty, 1: X, 2: O
+        # incremental=False keeps the old full scan after every move (reference mode)
+        self.incremental = incremental
+        self.winner = 0
+        # runs[d][r][c]: length of the line of same stones through (r, c) in direction d,
+        # only kept up to date at the two ends of each line
+        self.runs = [[[0] * cols for _ in range(rows)] for _ in DIRECTIONS]
+        # (row, col, player, winner before the move, run lengths either side of the move)
+        self.stack = []
+
+    def place_move(self, row, col, player):
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            if self.cells[row][col] == 0:
+                self.cells[row][col] = player
+                winner = self.winner
+                spans = None
+                if self.incremental:
+                    spans = self.update_runs(row, col, player)
+                    if max(before + 1 + after for before, after in spans) >= self.win_length:
+                        self.winner = player
+                else:
+                    self.winner = self.check_winner()
+                self.stack.append((row, col, player, winner, spans))
+                return True
+        return False
+
+    def push(self, move):
+        # Play move for whoever is next (X first), returns False if the cell is taken
+        player = 1 if len(self.stack) % 2 == 0 else 2
+        return self.place_move(move[0], move[1], player)
+
+    def pop(self):
+        # Take back the last move in O(1), returns (row, col, player) or None
+        if not self.stack:
+            return None
+        row, col, player, winner, spans = self.stack.pop()
+        self.cells[row][col] = 0
+        self.winner = winner
+        if spans is not None:
+            # the move was the last one played, so its neighbours' runs are exactly as it found them
+            for d, (dr, dc) in enumerate(DIRECTIONS):
+                before, after = spans[d]
+                runs = self.runs[d]
+                runs[row][col] = 0
+                if before:
+                    runs[row - dr][col - dc] = before
+                    runs[row - before * dr][col - before * dc] = before
+                if after:
+                    runs[row + dr][col + dc] = after
+                    runs[row + after * dr][col + after * dc] = after
+        return row, col, player
+
+    def to_bytes(self):
+        if self.rows * self.cols > 256:
+            raise ValueError("game records hold one byte per move, the board has more than 256 cells")
+        first = self.stack[0][2] if self.stack else 1
+        moves = bytearray()
+        for i, (row, col, player, _, _) in enumerate(self.stack):
+            if player != (first if i % 2 == 0 else 3 - first):
+                raise ValueError("game records need the players to alternate")
+            moves.append(row * self.cols + col)
+        return RECORD_HEADER.pack(RECORD_MAGIC, self.rows, self.cols, self.win_length, first, len(moves)) + bytes(moves)
+
+    @classmethod
+    def from_bytes(cls, data, offset=0, incremental=True):
+        board, _ = cls.read_record(data, offset, incremental)
+        return board
+
+    @classmethod
+    def read_record(cls, data, offset=0, incremental=True):
+        # Replay one record from data, returns the board and the offset just after the record
+        magic = bytes(data[offset:offset + 4])
+        if magic == RECORD_MAGIC:
+            _, rows, cols, win_length, player, count = RECORD_HEADER.unpack_from(data, offset)
+            start = offset + RECORD_HEADER.size
+        elif magic == OLD_RECORD_MAGIC:
+            _, rows, cols, player, count = OLD_RECORD_HEADER.unpack_from(data, offset)
+            win_length = WIN_LENGTH
+            start = offset + OLD_RECORD_HEADER.size
+        else:
+            raise ValueError("not a Caro game record")
+        board = cls(rows, cols, incremental, win_length)
+        for cell in data[start:start + count]:
+            board.place_move(cell // cols, cell % cols, player)
+            player = 3 - player
+        return board, start + count
+
+    def run_from(self, row, col, player, d, dr, dc):
+        # Length of the line of player stones starting next to (row, col) going (dr, dc)
+        r, c = row + dr, col + dc
+        if 0 <= r < self.rows and 0 <= c < self.cols and self.cells[r][c] == player:
+            return self.runs[d][r][c]
+        return 0
+
+    def update_runs(self, row, col, player):
+        # Join the new stone with its neighbours in every direction,
+        # returns the (before, after) lengths of the lines it joined
+        spans = []
+        for d, (dr, dc) in enumerate(DIRECTIONS):
+            before = self.run_from(row, col, player, d, -dr, -dc)
+            after = self.run_from(row, col, player, d, dr, dc)
+            length = before + 1 + after
+            runs = self.runs[d]
+            runs[row][col] = length
+            runs[row - before * dr][col - before * dc] = length
+            runs[row + after * dr][col + after * dc] = length
+            spans.append((before, after))
+        return spans
+
+    def check_winner(self):
+        # Check rows, columns and diagonals for a winner
+        k = self.win_length
+
+        # Check rows
+        for r in range(self.rows):
+            for c in range(self.cols - k + 1):
+                if self.cells[r][c] != 0 and all(self.cells[r][c + i] == self.cells[r][c] for i in range(k)):
+                    return self.cells[r][c]
+
+        # Check columns
+        for c in range(self.cols):
+            for r in range(self.rows - k + 1):
+                if self.cells[r][c] != 0 and all(self.cells[r + i][c] == self.cells[r][c] for i in range(k)):
+                    return self.cells[r][c]
+
+        # Check diagonals
+        for r in range(self.rows - k + 1):
+            for c in range(self.cols - k + 1):
+                if self.cells[r][c] != 0 and all(self.cells[r + i][c + i] == self.cells[r][c] for i in range(k)):
+                    return self.cells[r][c]
+
+        for r in range(k - 1, self.rows):
+            for c in range(self.cols - k + 1):
+                if self.cells[r][c] != 0 and all(self.cells[r - i][c + i] == self.cells[r][c] for i in range(k)):
+                    return self.cells[r][c]
+
+        return 0  # No winner yet
+
+
+def save_games(path, boards):
+    with open(path, "ab") as f:
+        for board in boards:
+            f.write(board.to_bytes())
+
+
+def load_games(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    offset = 0
+    while offset < len(data):
+        board, offset = CaroBoard.read_record(data, offset)
+        yield board
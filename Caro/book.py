@@ -0,0 +1,169 @@
+import argparse
+import mmap
+import os
+import random
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from arena import get_engine
+from board import CaroBoard
+from position import Position
+
+BOOK_MAGIC = b"CBK1"
+BOOK_HEADER = struct.Struct("<4sBBI")  # magic, rows, cols, number of entries
+BOOK_ENTRY = struct.Struct("<QHh")     # canonical Zobrist key, canonical move cell, score
+BOOK_SEED = 20240501  # fixed so the generator and every reader share the same Zobrist keys
+
+LAYOUTS = {}  # size -> Zobrist keys, cell permutation and inverse for each of the 8 symmetries
+
+
+def layout(size):
+    if size not in LAYOUTS:
+        rng = random.Random(BOOK_SEED + size)
+        keys = [None] + [[rng.getrandbits(64) for _ in range(size * size)] for _ in (1, 2)]
+        n = size - 1
+        transforms = (
+            lambda r, c: (r, c), lambda r, c: (c, n - r), lambda r, c: (n - r, n - c), lambda r, c: (n - c, r),
+            lambda r, c: (r, n - c), lambda r, c: (n - r, c), lambda r, c: (c, r), lambda r, c: (n - c, n - r),
+        )
+        perms, inverses = [], []
+        for t in transforms:
+            perm = [0] * (size * size)
+            inverse = [0] * (size * size)
+            for r in range(size):
+                for c in range(size):
+                    tr, tc = t(r, c)
+                    perm[r * size + c] = tr * size + tc
+                    inverse[tr * size + tc] = r * size + c
+            perms.append(perm)
+            inverses.append(inverse)
+        LAYOUTS[size] = keys, perms, inverses
+    return LAYOUTS[size]
+
+
+def canonical_key(board):
+    # Smallest Zobrist key over the 8 symmetries of the board, and the symmetry that gives it
+    keys, perms, _ = layout(board.rows)
+    stones = [(i, p) for i, p in enumerate(board.cells.ravel().tolist()) if p]
+    best = None
+    for t, perm in enumerate(perms):
+        key = 0
+        for i, p in stones:
+            key ^= keys[p][perm[i]]
+        if best is None or key < best[0]:
+            best = (key, t)
+    return best
+
+
+class OpeningBook:
+    # Sorted fixed-size entries read straight from a memory-mapped file with binary search,
+    # so opening the book costs nothing and processes share the same pages.
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.rows, self.cols, self.count = BOOK_HEADER.unpack_from(self.data, 0)
+        if magic != BOOK_MAGIC:
+            raise ValueError(f"{path} is not a Caro opening book")
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def find(self, key):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = BOOK_ENTRY.unpack_from(self.data, BOOK_HEADER.size + mid * BOOK_ENTRY.size)
+            if entry[0] < key:
+                lo = mid + 1
+            elif entry[0] > key:
+                hi = mid
+            else:
+                return entry
+        return None
+
+    def lookup(self, board):
+        # Book move for the position as (row, col), or None when it is not in the book
+        if (board.rows, board.cols) != (self.rows, self.cols):
+            return None
+        key, t = canonical_key(board)
+        entry = self.find(key)
+        if entry is None:
+            return None
+        _, _, inverses = layout(board.rows)
+        return divmod(inverses[t][entry[1]], board.cols)
+
+
+def analyse(job):
+    # Engine reply for one opening line, plus the most promising moves to expand next
+    moves, size, config, width = job
+    board = CaroBoard(size, size)
+    for move in moves:
+        board.push(move)
+    player = 1 if len(moves) % 2 == 0 else 2
+    engine = get_engine(config)
+    best = engine.best_move(board, player)
+    # order_moves works on the engine's position, which the search may have left mid-line
+    engine.pos = Position.from_board(board, engine.zobrist_keys(size, size))
+    children = [divmod(i, size) for i in engine.order_moves(player, 0, None)[:width]]
+    return moves, best, engine.score, children
+
+
+def generate_book(path, size=15, plies=4, width=4, config=None, workers=None):
+    config = config or {"time_limit": None, "max_nodes": 5000}
+    entries = {}
+    frontier = [()]
+    seen = set()
+    with ProcessPoolExecutor(workers) as pool:
+        for ply in range(plies):
+            jobs = [(moves, size, config, width) for moves in frontier]
+            frontier = []
+            for moves, best, score, children in pool.map(analyse, jobs):
+                if best is None:
+                    continue
+                board = CaroBoard(size, size)
+                for move in moves:
+                    board.push(move)
+                key, t = canonical_key(board)
+                _, perms, _ = layout(size)
+                entries[key] = (perms[t][best[0] * size + best[1]], max(-32768, min(32767, score)))
+                for child in children:
+                    board.push(child)
+                    child_key, _ = canonical_key(board)
+                    if child_key not in seen and not board.winner:
+                        seen.add(child_key)
+                        frontier.append(moves + (child,))
+                    board.pop()
+            print(f"ply {ply}: {len(jobs)} positions, {len(entries)} entries")
+
+    with open(path, "wb") as f:
+        f.write(BOOK_HEADER.pack(BOOK_MAGIC, size, size, len(entries)))
+        for key in sorted(entries):
+            f.write(BOOK_ENTRY.pack(key, *entries[key]))
+    return len(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a Caro opening book")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "caro_book.bin"),
+                        help="where caro.py looks for it by default")
+    parser.add_argument("--size", type=int, default=15)
+    parser.add_argument("--plies", type=int, default=4)
+    parser.add_argument("--width", type=int, default=4, help="replies expanded per position")
+    parser.add_argument("--nodes", type=int, default=5000, help="engine nodes per book move")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = generate_book(args.out, args.size, args.plies, args.width,
+                          {"time_limit": None, "max_nodes": args.nodes}, args.workers)
+    print(f"{count} entries written to {args.out} in {time.perf_counter() - start:.1f}s")
+
+    book = OpeningBook(args.out)
+    board = CaroBoard(args.size, args.size)
+    n = 10000
+    start = time.perf_counter()
+    for _ in range(n):
+        book.lookup(board)
+    print(f"first move {book.lookup(board)}, {n / (time.perf_counter() - start):.0f} lookups/s")
@@ -1,124 +1,296 @@
+import os
 import pygame
 import numpy as np
 import random
 import sys
 
+from board import CaroBoard, WIN_LENGTH, save_games
+from bitboard import BitBoard
+from scheduler import SearchScheduler, frame_stats
+from protocol import FULL, LEFT, MOVE, RESET, WELCOME, NetClient
+from sparse import SparseBoard, Viewport
+from mnk import SOLVABLE_CELLS
+
 # ==================== PARA =====================
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 RED = (255, 0, 0)
 
 ROWS, COLS = 15, 15
+WIN_K = WIN_LENGTH  # stones in a row to win; with e.g. 3x3 and 3 the computer plays perfectly from a solved table
 CELL_SIZE = 40
 WIDTH, HEIGHT = COLS * CELL_SIZE, ROWS * CELL_SIZE
+USE_BITBOARD = False
+COMPUTER_PLAYER = 2  # None for pvp
+THINK_TIME = 1.0  # seconds per computer move
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))  # the files below live next to this script
+BOOK_FILE = os.path.join(DATA_DIR, "caro_book.bin")  # built with book.py, used when present
+LOG_FILE = os.path.join(DATA_DIR, "caro_games.bin")  # S saves the game here, BACKSPACE takes back a move
+SERVER = None  # ("127.0.0.1", 5555) to play pvp through server.py, R starts a new game
+ROOM = 1
+INFINITE = False  # sparse board without edges: right drag pans, mouse wheel zooms
+
 
-class CaroBoard:
+class BoardRenderer:
+    # The grid is drawn once to a surface and X/O once to sprites. Each frame only the cells
+    # that differ from what is on screen are blitted and pushed with display.update(rects).
     def __init__(self, rows, cols):
-        self.rows = rows
-        self.cols = cols
-        self.cells = np.zeros((rows, cols), dtype=int)  # 0: empty, 1: X, 2: O
-
-    def place_move(self, row, col, player):
-        if 0 <= row < self.rows and 0 <= col < self.cols:
-            if self.cells[row][col] == 0:
-                self.cells[row][col] = player
-                return True
-        return False
-
-    def check_winner(self):
-        # Check rows, columns and diagonals for a winner
-        
-        # Check rows
-        for r in range(self.rows):
-            for c in range(self.cols - 4):
-                if self.cells[r][c] != 0 and all(self.cells[r][c + i] == self.cells[r][c] for i in range(5)):
-                    return self.cells[r][c]
-
-        # Check columns
-        for c in range(self.cols):
-            for r in range(self.rows - 4):
-                if self.cells[r][c] != 0 and all(self.cells[r + i][c] == self.cells[r][c] for i in range(5)):
-                    return self.cells[r][c]
-
-        # Check diagonals
-        for r in range(self.rows - 4):
-            for c in range(self.cols - 4):
-                if self.cells[r][c] != 0 and all(self.cells[r + i][c + i] == self.cells[r][c] for i in range(5)):
-                    return self.cells[r][c]
-
-        for r in range(4, self.rows):
-            for c in range(self.cols - 4):
-                if self.cells[r][c] != 0 and all(self.cells[r - i][c + i] == self.cells[r][c] for i in range(5)):
-                    return self.cells[r][c]
-
-        return 0  # No winner yet
-
-
-def draw_board(surface, board):
-    for r in range(board.rows):
-        for c in range(board.cols):
-            rect = pygame.Rect(c * CELL_SIZE, r * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-            pygame.draw.rect(surface, BLACK, rect, 1)
-            # if board.cells[r][c] == 1:
-            #     pygame.draw.circle(surface, BLACK, rect.center, cell_size // 4)
-
-            if board.cells[r][c] == 1:  # X
-                pygame.draw.line(surface, BLACK, rect.topleft, rect.bottomright, 2)
-                pygame.draw.line(surface, BLACK, rect.topright, rect.bottomleft, 2)
-
-            elif board.cells[r][c] == 2:  # O
-                pygame.draw.circle(surface, RED, rect.center, CELL_SIZE // 3, 2)
+        self.grid = pygame.Surface((cols * CELL_SIZE, rows * CELL_SIZE))
+        self.grid.fill(WHITE)
+        for r in range(rows):
+            for c in range(cols):
+                pygame.draw.rect(self.grid, BLACK, (c * CELL_SIZE, r * CELL_SIZE, CELL_SIZE, CELL_SIZE), 1)
+        self.sprites = {}
+        for player in (1, 2):
+            sprite = pygame.Surface((CELL_SIZE, CELL_SIZE), pygame.SRCALPHA)
+            rect = sprite.get_rect()
+            if player == 1:  # X
+                pygame.draw.line(sprite, BLACK, rect.topleft, (rect.right - 1, rect.bottom - 1), 2)
+                pygame.draw.line(sprite, BLACK, (rect.right - 1, rect.top), (rect.left, rect.bottom - 1), 2)
+            else:  # O
+                pygame.draw.circle(sprite, RED, rect.center, CELL_SIZE // 3, 2)
+            self.sprites[player] = sprite
+        self.shown = None  # cells as they are on screen
+        self.shown_winner = 0
+
+    def draw(self, surface, board, game_over):
+        winner = board.winner if game_over else 0
+        if self.shown is None or winner != self.shown_winner:
+            # first frame, or the win text came or went: redraw everything
+            surface.blit(self.grid, (0, 0))
+            for r, c in np.argwhere(board.cells != 0):
+                surface.blit(self.sprites[board.cells[r][c]], (c * CELL_SIZE, r * CELL_SIZE))
+            if winner:
+                win_screen(surface, winner)
+            pygame.display.flip()
+        else:
+            rects = []
+            for r, c in np.argwhere(board.cells != self.shown):
+                rect = pygame.Rect(c * CELL_SIZE, r * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+                surface.blit(self.grid, rect, rect)
+                if board.cells[r][c]:
+                    surface.blit(self.sprites[board.cells[r][c]], rect)
+                rects.append(rect)
+            if rects:
+                pygame.display.update(rects)
+        self.shown = board.cells.copy()
+        self.shown_winner = winner
+
+def draw_sparse_board(surface, board, view):
+    # Only the grid lines and stones inside the viewport are drawn
+    top, left, bottom, right = view.visible()
+    if board.rows is not None:
+        top, bottom = max(top, 0), min(bottom, board.rows)
+    if board.cols is not None:
+        left, right = max(left, 0), min(right, board.cols)
+    if top >= bottom or left >= right:
+        return
+    size = view.cell_size
+    x0, y0 = view.to_screen(top, left)
+    x1, y1 = view.to_screen(bottom, right)
+    for r in range(top, bottom + 1):
+        y = y0 + (r - top) * size
+        pygame.draw.line(surface, BLACK, (x0, y), (x1, y))
+    for c in range(left, right + 1):
+        x = x0 + (c - left) * size
+        pygame.draw.line(surface, BLACK, (x, y0), (x, y1))
+    for r, c, player in board.stones_in(top, left, bottom, right):
+        x, y = view.to_screen(r, c)
+        rect = pygame.Rect(x, y, size, size)
+        if player == 1:  # X
+            pygame.draw.line(surface, BLACK, rect.topleft, rect.bottomright, 2)
+            pygame.draw.line(surface, BLACK, rect.topright, rect.bottomleft, 2)
+        else:  # O
+            pygame.draw.circle(surface, RED, rect.center, size // 3, 2)
 
 def win_game(winner):
     print(f"Player {winner} wins!")
 
-def win_screen(winner):
-    font = pygame.font.SysFont(None, 74)
-    text = font.render(f"Player {winner} wins!", True, RED)
+win_texts = {}  # winner -> rendered text, the font is only loaded once
+
+def win_screen(surface, winner):
+    if winner not in win_texts:
+        font = pygame.font.SysFont(None, 74)
+        win_texts[winner] = font.render(f"Player {winner} wins!", True, RED)
+    text = win_texts[winner]
     text_rect = text.get_rect(center=(WIDTH // 2, HEIGHT // 2))
-    window.blit(text, text_rect)
+    surface.blit(text, text_rect)
+
+
+
+
+if __name__ == "__main__":
+    pygame.init()
+    window = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Caro")
+    clock = pygame.time.Clock()
+
+    if INFINITE:
+        board = SparseBoard()
+        view = Viewport(WIDTH, HEIGHT, CELL_SIZE)
+        view.centre_on(0, 0)
+    else:
+        board = BitBoard(ROWS, COLS) if USE_BITBOARD and WIN_K == WIN_LENGTH else CaroBoard(ROWS, COLS, win_length=WIN_K)
+        renderer = BoardRenderer(ROWS, COLS)
+    view_changed = True
+    shown_moves = 0
+    curr_player = 1
+    game_over = False
+    net = NetClient(*SERVER, ROOM) if SERVER else None
+    computer = None if net or INFINITE else COMPUTER_PLAYER
+    # the search engine plays five in a row; other win lengths are only for boards small enough to solve.
+    # The worker maps the solver's table, solving and saving it the first time (python mnk.py --save
+    # makes it ahead of time), and searches the positions the table does not hold
+    solver = (ROWS, COLS, WIN_K) if computer and WIN_K != WIN_LENGTH else None
+    if solver and ROWS * COLS > SOLVABLE_CELLS:
+        pygame.quit()
+        sys.exit(f"{WIN_K} in a row needs a board of at most {SOLVABLE_CELLS} cells to solve, not {ROWS}x{COLS}")
+    # the computer thinks in another process so the window keeps drawing at 60 FPS
+    scheduler = SearchScheduler({"time_limit": THINK_TIME}, BOOK_FILE, solver) if computer else None
+    frame_times = []
+
+
 
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                if scheduler:
+                    scheduler.close()
+                if net:
+                    net.close()
+                pygame.quit()
+                exit()
 
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_BACKSPACE and not net:
+                # in player vs com take back moves until it is the human's turn again: the computer's
+                # reply too, or only the human's last move when the computer was still thinking on it
+                if scheduler:
+                    scheduler.cancel()
+                while True:
+                    undone = board.pop()
+                    if undone is None:
+                        break
+                    curr_player = undone[2]
+                    if curr_player != computer:
+                        break
+                game_over = board.winner != 0
 
+            if INFINITE and event.type == pygame.MOUSEMOTION and event.buttons[2]:
+                view.pan(*event.rel)
+                view_changed = True
 
-pygame.init()
-window = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Caro")
-clock = pygame.time.Clock()
+            if INFINITE and event.type == pygame.MOUSEWHEEL:
+                view.zoom(1.1 ** event.y, *pygame.mouse.get_pos())
+                view_changed = True
 
-board = CaroBoard(ROWS, COLS)
-curr_player = 1
-game_over = False
+            if event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE) and not INFINITE:
+                renderer.shown = None
 
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_s and not USE_BITBOARD and not INFINITE:
+                save_games(LOG_FILE, [board])
+                print(f"Saved {len(board.stack)} moves to {LOG_FILE}")
 
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_r and net:
+                net.send_reset()
 
-while True:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            exit()
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and not game_over and curr_player != computer:
+                pos = pygame.mouse.get_pos()
+                if INFINITE:
+                    row, col = view.to_cell(*pos)
+                else:
+                    col = pos[0] // CELL_SIZE
+                    row = pos[1] // CELL_SIZE
+                if net:
+                    # the server checks the move and sends it back to both players
+                    if curr_player == net.player:
+                        net.send_move(row, col)
+                elif board.place_move(row, col, curr_player):
+                    if board.winner != 0:
+                        game_over = True
+                        win_game(board.winner)
+                        if scheduler:
+                            scheduler.cancel()  # the ponder on the computer's last move never ends by itself
+                    else:
+                        curr_player = 2 if curr_player == 1 else 1
 
-        if event.type == pygame.MOUSEBUTTONDOWN and not game_over:
-            pos = pygame.mouse.get_pos()
-            col = pos[0] // CELL_SIZE
-            row = pos[1] // CELL_SIZE
-            board.place_move(row, col, curr_player)
-            winner = board.check_winner()
-            if winner != 0:
-                game_over = True
-                win_game(winner)
+        if net:
+            for kind, values in net.poll():
+                if kind == WELCOME:
+                    # the server's board and rules (five in a row), whatever this client was set up with
+                    board = SparseBoard(net.rows, net.cols) if INFINITE else CaroBoard(net.rows, net.cols)
+                    if INFINITE:
+                        view_changed = True
+                    elif (net.rows, net.cols) != (ROWS, COLS):
+                        window = pygame.display.set_mode((net.cols * CELL_SIZE, net.rows * CELL_SIZE))
+                        renderer = BoardRenderer(net.rows, net.cols)
+                    else:
+                        renderer.shown = None
+                elif kind == MOVE:
+                    player, cell, winner = values
+                    board.place_move(cell // net.cols, cell % net.cols, player)
+                    curr_player = 2 if player == 1 else 1
+                    if winner != 0:
+                        game_over = True
+                        win_game(winner)
+                elif kind == RESET:
+                    board = SparseBoard(net.rows, net.cols) if INFINITE else CaroBoard(net.rows, net.cols)
+                    view_changed = True
+                    curr_player = 1
+                    game_over = False
+                    print(f"New game, you are player {net.player}")
+                elif kind == LEFT:
+                    print("The other player left")
+                elif kind == FULL:
+                    print(f"Room {ROOM} is full")
 
-            else:
-                curr_player = 2 if curr_player == 1 else 1
+        if curr_player == computer and not game_over and scheduler and not scheduler.thinking:
+            scheduler.think(board, curr_player, THINK_TIME)
+            frame_times = []
 
-    
+        if scheduler:
+            for message in scheduler.poll():
+                if message[0] == "info":
+                    _, _, depth, score, pv, nodes, nps = message
+                    print(f"  depth {depth} score {score} pv {pv} {nodes} nodes {nps:.0f} nodes/s")
+                elif message[0] == "done":
+                    _, _, move, depth, score, nodes, nps = message
+                    print(f"Computer: {move} depth {depth} score {score} {nodes} nodes {nps:.0f} nodes/s")
+                    stats = frame_stats(frame_times)
+                    if stats:
+                        print("  frame time while thinking: mean {:.1f} ms, stdev {:.1f} ms, "
+                              "p99 {:.1f} ms, max {:.1f} ms".format(*stats))
+                    if move is not None and board.place_move(*move, curr_player):
+                        if board.winner != 0:
+                            game_over = True
+                            win_game(board.winner)
+                            scheduler.cancel()
+                        else:
+                            curr_player = 2 if curr_player == 1 else 1
+                            if not solver:
+                                scheduler.ponder(board, computer)
+                    elif move is None:
+                        # no move left (a full board): stop, or a new think would be started every frame
+                        game_over = True
+                        scheduler.cancel()
 
-    window.fill(WHITE)
-    draw_board(window, board)
 
-    if game_over:
-        winner = board.check_winner()
-        win_screen(winner)
+        if INFINITE:
+            if view_changed or len(board.stack) != shown_moves:
+                window.fill(WHITE)
+                draw_sparse_board(window, board, view)
+                if game_over:
+                    win_screen(window, board.winner)
+                pygame.display.flip()
+                view_changed = False
+                shown_moves = len(board.stack)
+        else:
+            renderer.draw(window, board, game_over)
 
-    pygame.display.flip()
-    clock.tick(60)
\ No newline at end of file
+        if (scheduler and scheduler.thinking) or net:
+            # keep polling the search / the server at 60 FPS
+            frame_time = clock.tick(60)
+            if scheduler and scheduler.thinking:
+                frame_times.append(frame_time)
+        else:
+            # nothing can change until the next input event, so sleep until it comes
+            pygame.event.post(pygame.event.wait())
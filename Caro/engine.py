@@ -0,0 +1,250 @@
+import random
+import time
+
+from position import Position
+from vcf import ThreatSearch
+
+WIN_SCORE = 1_000_000
+INF = 10 * WIN_SCORE
+MATE_BOUND = WIN_SCORE - 1000  # a score past this is a win WIN_SCORE - score plies away
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class TranspositionTable:
+    # Fixed number of slots indexed by the low bits of the Zobrist key.
+    # An entry is replaced by a deeper one, or by anything once it is from an older search.
+    # Win scores count plies from the root, so they are stored as plies from the entry's own node and
+    # turned back for the ply they are read at.
+    def __init__(self, size_bits=18):
+        self.mask = (1 << size_bits) - 1
+        self.slots = [None] * (1 << size_bits)
+        self.age = 0
+
+    def new_search(self):
+        self.age += 1
+
+    def get(self, key, ply=0):
+        entry = self.slots[key & self.mask]
+        if entry is not None and entry[0] == key:
+            score = entry[2]
+            if score >= MATE_BOUND:
+                return entry[:2] + (score - ply,) + entry[3:]
+            if score <= -MATE_BOUND:
+                return entry[:2] + (score + ply,) + entry[3:]
+            return entry
+        return None
+
+    def put(self, key, depth, score, flag, move, ply=0):
+        i = key & self.mask
+        old = self.slots[i]
+        if old is None or old[5] != self.age or depth >= old[1]:
+            if score >= MATE_BOUND:
+                score += ply
+            elif score <= -MATE_BOUND:
+                score -= ply
+            self.slots[i] = (key, depth, score, flag, move, self.age)
+
+
+class Engine:
+    # Iterative-deepening alpha-beta (negamax) with a transposition table,
+    # killer/history move ordering and a time or node budget per move.
+    def __init__(self, time_limit=1.0, max_nodes=None, max_depth=20, width=12, tt_bits=18, seed=0,
+                 threat_nodes=5000, vct=False, book=None, stop=None, on_iteration=None):
+        self.time_limit = time_limit
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.width = width  # moves searched per node after ordering, None for all
+        self.threat_nodes = threat_nodes  # node limit for the forced-win check before searching, 0 to skip
+        self.vct = vct
+        self.book = book  # OpeningBook (or anything with lookup(board)) tried before searching
+        self.stop = stop  # callable, the search is abandoned as soon as it returns True
+        self.on_iteration = on_iteration  # called with the engine after every finished depth
+        self.tt = TranspositionTable(tt_bits)
+        self.rng = random.Random(seed)
+        self.zobrist = {}  # (rows, cols) -> per-player random keys
+        self.side_key = self.rng.getrandbits(64)
+        self.history = {}
+        self.killers = []
+        self.nodes = 0
+        self.elapsed = 0.0
+        self.depth = 0
+        self.score = 0
+        self.pv = []
+
+    @property
+    def nps(self):
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def zobrist_keys(self, rows, cols):
+        if (rows, cols) not in self.zobrist:
+            size = rows * cols
+            self.zobrist[(rows, cols)] = [
+                None,
+                [self.rng.getrandbits(64) for _ in range(size)],
+                [self.rng.getrandbits(64) for _ in range(size)],
+            ]
+        return self.zobrist[(rows, cols)]
+
+    def best_move(self, board, player):
+        # Search board for player, returns (row, col) or None if the board is full
+        if self.book is not None:
+            move = self.book.lookup(board)
+            if move is not None:
+                self.nodes, self.elapsed, self.depth, self.pv = 0, 0.0, 0, [move]
+                return move
+
+        zobrist = self.zobrist_keys(board.rows, board.cols)
+        self.pos = Position.from_board(board, zobrist)
+        self.tt.new_search()
+        self.history = {}
+        self.killers = [[None, None] for _ in range(self.max_depth + 2)]
+        self.nodes = 0
+        self.start = time.perf_counter()
+        self.depth = 0
+        self.pv = []
+
+        moves = self.order_moves(player, 0, None)
+        if not moves:
+            return None
+        if self.threat_nodes:
+            solver = ThreatSearch(self.threat_nodes, vct=self.vct)
+            line = solver.solve(board, player)
+            self.nodes += solver.nodes
+            if line is not None:
+                self.elapsed = time.perf_counter() - self.start
+                self.score, self.depth, self.pv = WIN_SCORE, len(line), line
+                return line[0]
+        best = moves[0]
+        try:
+            for depth in range(1, self.max_depth + 1):
+                score, move = self.search_root(moves, depth, player)
+                best, self.score, self.depth = move, score, depth
+                moves.remove(move)
+                moves.insert(0, move)
+                if self.on_iteration is not None:
+                    self.elapsed = time.perf_counter() - self.start
+                    self.pv = self.principal_variation(best, player)
+                    self.on_iteration(self)
+                if abs(score) >= WIN_SCORE - self.max_depth:
+                    break
+        except SearchTimeout:
+            # the aborted search left moves on the position
+            self.pos = Position.from_board(board, zobrist)
+        self.elapsed = time.perf_counter() - self.start
+        self.pv = self.principal_variation(best, player)
+        return divmod(best, board.cols)
+
+    def check_time(self):
+        if self.stop is not None and self.stop():
+            raise SearchTimeout
+        if self.time_limit is not None and time.perf_counter() - self.start >= self.time_limit:
+            raise SearchTimeout
+
+    def key(self, player):
+        return self.pos.hash ^ (self.side_key if player == 2 else 0)
+
+    def order_moves(self, player, ply, tt_move):
+        pos = self.pos
+        killers = self.killers[ply] if ply < len(self.killers) else (None, None)
+        scored = []
+        for i in pos.candidates():
+            attack, five = pos.gain(i, player)
+            defend, block = pos.gain(i, 3 - player)
+            value = attack + defend + self.history.get((player, i), 0)
+            if i == tt_move or five:
+                value += 4 * INF
+            elif block:
+                value += 2 * INF
+            elif i in killers:
+                value += INF
+            scored.append((value, i))
+        scored.sort(reverse=True)
+        moves = [i for _, i in scored]
+        if self.width is not None and ply > 0:
+            moves = moves[:self.width]
+        return moves
+
+    def search_root(self, moves, depth, player):
+        alpha, beta = -INF, INF
+        best_move = moves[0]
+        for i in moves:
+            if self.pos.play(i, player):
+                score = WIN_SCORE
+            else:
+                score = -self.negamax(depth - 1, -beta, -alpha, 3 - player, 1)
+            self.pos.undo(i, player)
+            if score > alpha:
+                alpha, best_move = score, i
+        self.tt.put(self.key(player), depth, alpha, EXACT, best_move)
+        return alpha, best_move
+
+    def negamax(self, depth, alpha, beta, player, ply):
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise SearchTimeout
+        if self.nodes & 255 == 0:
+            self.check_time()
+        pos = self.pos
+        key = self.key(player)
+        tt_move = None
+        entry = self.tt.get(key, ply)
+        if entry is not None:
+            tt_move = entry[4]
+            if entry[1] >= depth:
+                score, flag = entry[2], entry[3]
+                if flag == EXACT or (flag == LOWER and score >= beta) or (flag == UPPER and score <= alpha):
+                    return score
+
+        if depth == 0:
+            return pos.patterns.evaluate(player)
+
+        moves = self.order_moves(player, ply, tt_move)
+        if not moves:
+            return 0
+
+        alpha_start = alpha
+        best, best_move = -INF, moves[0]
+        for i in moves:
+            if pos.play(i, player):
+                score = WIN_SCORE - ply
+            else:
+                score = -self.negamax(depth - 1, -beta, -alpha, 3 - player, ply + 1)
+            pos.undo(i, player)
+            if score > best:
+                best, best_move = score, i
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                killers = self.killers[ply]
+                if i != killers[0]:
+                    killers[1], killers[0] = killers[0], i
+                self.history[(player, i)] = self.history.get((player, i), 0) + depth * depth
+                break
+
+        flag = UPPER if best <= alpha_start else LOWER if best >= beta else EXACT
+        self.tt.put(key, depth, best, flag, best_move, ply)
+        return best
+
+    def principal_variation(self, first, player):
+        # Follow the transposition table from the chosen move, as (row, col) pairs
+        pos = self.pos
+        line = [first]
+        played = [(first, player)]
+        five = pos.play(first, player)
+        player = 3 - player
+        while len(line) < self.depth and not five:
+            entry = self.tt.get(self.key(player))
+            if entry is None or entry[4] is None or pos.cells[entry[4]]:
+                break
+            line.append(entry[4])
+            played.append((entry[4], player))
+            five = pos.play(entry[4], player)
+            player = 3 - player
+        for i, p in reversed(played):
+            pos.undo(i, p)
+        return [divmod(i, pos.cols) for i in line]
@@ -0,0 +1,113 @@
+from board import DIRECTIONS, WIN_LENGTH
+
+WALL = 3
+FIVE = 1_000_000
+OPEN = (0, 10, 100, 1000, 100_000)  # _????_ with n stones and the two ends empty
+CLOSED = (0, 1, 10, 100, 1000)      # ????? with n stones and no opponent
+
+
+def window_value(cells, player):
+    # Score of the best pattern player has in a 6-cell window (0: empty, 1/2: stone, 3: wall)
+    best = 0
+    for sub in (cells[0:5], cells[1:6]):
+        if all(c == 0 or c == player for c in sub):
+            n = sub.count(player)
+            if n == WIN_LENGTH:
+                return FIVE
+            best = max(best, CLOSED[n])
+    if cells[0] == 0 and cells[5] == 0 and all(c == 0 or c == player for c in cells[1:5]):
+        best = max(best, OPEN[cells[1:5].count(player)])
+    return best
+
+
+def build_pattern_table():
+    # Every 6-cell window, 2 bits per cell, to the X score minus the O score
+    table = []
+    for code in range(1 << 12):
+        cells = [(code >> (2 * j)) & 3 for j in range(6)]
+        table.append(window_value(cells, 1) - window_value(cells, 2))
+    return table
+
+
+PATTERN_SCORE = build_pattern_table()
+LAYOUT = {}  # (rows, cols) -> cell_lines, empty line codes, empty line scores
+
+
+class PatternEvaluator:
+    # Keeps every row, column and diagonal of the board as a 2-bit-per-cell code with a wall at
+    # both ends, and a cached score per line. Placing or removing a stone only rescores the
+    # windows of the four lines through that cell, so undo gives back exactly the old score.
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.cell_lines, codes, line_scores = self.layout(rows, cols)
+        self.codes = list(codes)
+        self.line_scores = list(line_scores)
+        self.score = sum(line_scores)  # X minus O
+
+    @staticmethod
+    def layout(rows, cols):
+        # (line, bit shift, first window, last window + 1) for every cell, and the empty lines
+        if (rows, cols) in LAYOUT:
+            return LAYOUT[(rows, cols)]
+        cell_lines = [[] for _ in range(rows * cols)]
+        codes, line_scores = [], []
+        for dr, dc in DIRECTIONS:
+            for r in range(rows):
+                for c in range(cols):
+                    # only start a line at the first cell inside the board
+                    if 0 <= r - dr < rows and 0 <= c - dc < cols:
+                        continue
+                    cells = []
+                    rr, cc = r, c
+                    while 0 <= rr < rows and 0 <= cc < cols:
+                        cells.append(rr * cols + cc)
+                        rr, cc = rr + dr, cc + dc
+                    if len(cells) < WIN_LENGTH:
+                        continue
+                    line = len(codes)
+                    windows = len(cells) - 3  # 6-cell windows over the line plus its two walls
+                    for j, i in enumerate(cells):
+                        first = max(0, j + 1 - 5)
+                        last = min(j + 1, windows - 1)
+                        cell_lines[i].append((line, 2 * (j + 1), first, last + 1))
+                    code = WALL | WALL << (2 * (len(cells) + 1))
+                    codes.append(code)
+                    line_scores.append(sum(PATTERN_SCORE[(code >> (2 * k)) & 4095] for k in range(windows)))
+        LAYOUT[(rows, cols)] = cell_lines, codes, line_scores
+        return LAYOUT[(rows, cols)]
+
+    @classmethod
+    def from_board(cls, board):
+        evaluator = cls(board.rows, board.cols)
+        for i, player in enumerate(board.cells.ravel().tolist()):
+            if player:
+                evaluator.place_index(i, player)
+        return evaluator
+
+    def place(self, row, col, player):
+        self.place_index(row * self.cols + col, player)
+
+    def remove(self, row, col):
+        self.remove_index(row * self.cols + col)
+
+    def evaluate(self, player):
+        # Score from the point of view of player
+        return self.score if player == 1 else -self.score
+
+    def place_index(self, i, player):
+        for line, shift, first, last in self.cell_lines[i]:
+            self.update(line, self.codes[line] | player << shift, first, last)
+
+    def remove_index(self, i):
+        for line, shift, first, last in self.cell_lines[i]:
+            self.update(line, self.codes[line] & ~(3 << shift), first, last)
+
+    def update(self, line, code, first, last):
+        old = self.codes[line]
+        delta = 0
+        for k in range(2 * first, 2 * last, 2):
+            delta += PATTERN_SCORE[(code >> k) & 4095] - PATTERN_SCORE[(old >> k) & 4095]
+        self.codes[line] = code
+        self.line_scores[line] += delta
+        self.score += delta
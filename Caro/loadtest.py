@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+import multiprocessing as mp
+import random
+import time
+
+from protocol import JOIN, LEFT, MOVE, RESET, SERVER_FORMATS, WELCOME, pack
+from server import raise_file_limit, run_server
+
+
+async def play(host, port, room, deadline, latencies, rng):
+    # One simulated player: random legal moves, player 1 starts a new game whenever one ends
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(pack(JOIN, room))
+    player = rows = cols = None
+    empty = []
+    sent_at = None
+    moves = 0
+
+    def send_move():
+        nonlocal sent_at
+        cell = empty[rng.randrange(len(empty))]
+        sent_at = time.perf_counter()
+        writer.write(pack(MOVE, cell))
+
+    try:
+        while time.perf_counter() < deadline:
+            kind = await reader.readexactly(1)
+            values = SERVER_FORMATS[kind].unpack(await reader.readexactly(SERVER_FORMATS[kind].size))
+            if kind == WELCOME:
+                player, rows, cols = values
+            elif kind == RESET:
+                empty = list(range(rows * cols))
+                if player == 1:
+                    send_move()
+            elif kind == MOVE:
+                mover, cell, winner = values
+                empty.remove(cell)
+                if mover == player:
+                    latencies.append(time.perf_counter() - sent_at)
+                    moves += 1
+                if winner or not empty:
+                    if player == 1:
+                        writer.write(pack(RESET))
+                elif mover != player:
+                    send_move()
+            elif kind == LEFT:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    writer.close()
+    return moves
+
+
+async def run_clients(host, port, rooms, duration, seed):
+    rng = random.Random(seed)
+    latencies = []
+    start = time.perf_counter()
+    deadline = start + duration
+    tasks = []
+    for room in range(rooms):
+        for _ in range(2):
+            tasks.append(asyncio.create_task(play(host, port, room, deadline, latencies, rng)))
+        if room % 100 == 99:
+            await asyncio.sleep(0)  # let the first rooms connect while the rest are created
+    moves = sum(await asyncio.gather(*tasks))
+    return moves, time.perf_counter() - start, latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate many Caro clients over loopback")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument("--rooms", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--spawn-server", action="store_true", help="start the server in a child process")
+    args = parser.parse_args()
+
+    raise_file_limit()
+    if args.spawn_server:
+        ready = mp.Event()
+        mp.Process(target=run_server, args=(args.host, args.port, ready), daemon=True).start()
+        ready.wait()
+
+    moves, elapsed, latencies = asyncio.run(run_clients(args.host, args.port, args.rooms, args.duration, args.seed))
+    latencies.sort()
+    if latencies:
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+        print(f"{args.rooms} rooms: {moves} moves in {elapsed:.1f}s, {moves / elapsed:.0f} moves/s, "
+              f"latency p50 {p50:.2f} ms p99 {p99:.2f} ms")
+    else:
+        print("no moves were played")
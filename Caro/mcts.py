@@ -0,0 +1,289 @@
+import math
+import random
+import time
+
+import numpy as np
+
+from board import CaroBoard, WIN_LENGTH
+from position import Position
+
+PAD = WIN_LENGTH - 1  # empty border around rollout boards so line checks never leave the array
+
+
+def batch_rollouts(cells, player, n, rng):
+    # Play n random games at once from a (rows, cols) position with player to move.
+    # Returns the winner of every game (0 for a full board).
+    rows, cols = cells.shape
+    width = cols + 2 * PAD
+    padded = np.zeros((rows + 2 * PAD, width), dtype=np.int8)
+    padded[PAD:PAD + rows, PAD:PAD + cols] = cells
+    boards = np.repeat(padded.reshape(1, -1), n, axis=0)
+    inner = np.arange(padded.size).reshape(padded.shape)[PAD:PAD + rows, PAD:PAD + cols]
+    empties = inner[cells == 0]
+    # each game plays the empty cells in its own random order
+    moves = empties[np.argsort(rng.random((n, len(empties))), axis=1)]
+
+    winners = np.zeros(n, dtype=np.int8)
+    running = np.arange(n)
+    for step in range(len(empties)):
+        cell = moves[running, step]
+        boards[running, cell] = player
+        longest = np.zeros(len(running), dtype=np.int8)
+        for d in (1, width, width + 1, width - 1):
+            count = np.ones(len(running), dtype=np.int8)
+            for sign in (d, -d):
+                run = np.ones(len(running), dtype=bool)
+                for k in range(1, WIN_LENGTH):
+                    run &= boards[running, cell + sign * k] == player
+                    count += run
+            np.maximum(longest, count, out=longest)
+        won = longest >= WIN_LENGTH
+        winners[running[won]] = player
+        running = running[~won]
+        if len(running) == 0:
+            break
+        player = 3 - player
+    return winners
+
+
+def python_rollout(cells, player, rng):
+    # One random game with plain Python lists, the baseline batch_rollouts is compared with
+    rows, cols = cells.shape
+    grid = cells.tolist()
+    empties = [(r, c) for r in range(rows) for c in range(cols) if not grid[r][c]]
+    rng.shuffle(empties)
+    for r, c in empties:
+        grid[r][c] = player
+        for dr, dc in ((0, 1), (1, 0), (1, 1), (-1, 1)):
+            count = 1
+            for sign in (1, -1):
+                rr, cc = r + sign * dr, c + sign * dc
+                while 0 <= rr < rows and 0 <= cc < cols and grid[rr][cc] == player:
+                    count += 1
+                    rr, cc = rr + sign * dr, cc + sign * dc
+            if count >= WIN_LENGTH:
+                return player
+        player = 3 - player
+    return 0
+
+
+class MCTS:
+    # UCT tree search where every expanded leaf is scored by a batch of vectorized random playouts.
+    # Nodes live in preallocated parallel lists (the pool); the subtree under the move actually
+    # played is kept for the next search, and the tree never grows past max_nodes.
+    def __init__(self, time_limit=1.0, max_playouts=None, batch=256, max_nodes=200_000, c=1.4, seed=0):
+        self.time_limit = time_limit
+        self.max_playouts = max_playouts
+        self.batch = batch
+        self.max_nodes = max_nodes
+        self.c = c
+        self.rng = np.random.default_rng(seed)
+        self.zobrist = None
+        self.history = None  # moves from the start of the game to the root
+        self.playouts = 0
+        self.elapsed = 0.0
+        self.nodes = 0
+        self.spare = None  # second pool that compact() copies into, the two are swapped
+        self.clear()
+
+    def clear(self):
+        self.parent, self.move, self.mover, self.first, self.count, self.visits, self.value, self.winner = \
+            self.allocate() if self.spare is None else self.spare
+        self.spare = None
+        self.count[0] = -1
+        self.visits[0] = 0
+        self.value[0] = 0.0
+        self.winner[0] = 0
+        self.size = 1
+        self.root = 0
+
+    def allocate(self):
+        size = self.max_nodes
+        return (
+            [-1] * size,   # parent
+            [-1] * size,   # move that leads to the node
+            [0] * size,    # player who played that move
+            [0] * size,    # index of the first child
+            [-1] * size,   # number of children, -1 while unexpanded
+            [0] * size,    # visits
+            [0.0] * size,  # wins for the mover, draws count half
+            [0] * size,    # set when the move ended the game
+        )
+
+    @property
+    def playouts_per_sec(self):
+        return self.playouts / self.elapsed if self.elapsed > 0 else 0.0
+
+    def reuse(self, moves, player):
+        # Walk the old tree along the moves played since the last search, or start a new one
+        if self.history is None or moves[:len(self.history)] != self.history:
+            self.clear()
+        else:
+            node = self.root
+            for move in moves[len(self.history):]:
+                node = next((child for child in range(self.first[node], self.first[node] + max(0, self.count[node]))
+                             if self.move[child] == move), None)
+                if node is None:
+                    break
+            if node is None:
+                self.clear()
+            else:
+                self.compact(node)
+        if self.size == 1:
+            self.mover[0] = 3 - player
+        self.history = list(moves)
+
+    def compact(self, node):
+        # Copy the subtree under node to the front of the pool and make it the root
+        old = (self.parent, self.move, self.mover, self.first, self.count, self.visits, self.value, self.winner)
+        parent, move, mover, first, count, visits, value, winner = old
+        self.clear()
+        self.spare = old
+        order = [node]
+        new_index = {node: 0}
+        i = 0
+        while i < len(order):
+            n = order[i]
+            i += 1
+            if count[n] > 0:
+                for child in range(first[n], first[n] + count[n]):
+                    new_index[child] = len(order)
+                    order.append(child)
+        for n in order:
+            j = new_index[n]
+            self.parent[j] = new_index.get(parent[n], -1) if n != node else -1
+            self.move[j] = move[n]
+            self.mover[j] = mover[n]
+            self.count[j] = count[n]
+            self.first[j] = new_index[first[n]] if count[n] > 0 else 0
+            self.visits[j] = visits[n]
+            self.value[j] = value[n]
+            self.winner[j] = winner[n]
+        self.size = len(order)
+        self.root = 0
+
+    def best_move(self, board, player):
+        moves = [row * board.cols + col for row, col, *_ in board.stack]
+        self.reuse(moves, player)
+        self.playouts = 0
+        self.elapsed = 0.0
+        if board.winner or self.winner[self.root] or len(moves) == board.rows * board.cols:
+            # the game is over, there is no move to search for
+            self.nodes = self.size
+            return None
+        pos = Position.from_board(board, self.zobrist_keys(board.rows * board.cols))
+        start = time.perf_counter()
+        while True:
+            self.iterate(pos)
+            self.elapsed = time.perf_counter() - start
+            if self.max_playouts is not None and self.playouts >= self.max_playouts:
+                break
+            if self.time_limit is not None and self.elapsed >= self.time_limit:
+                break
+        self.nodes = self.size
+        root = self.root
+        if self.count[root] <= 0:
+            return None
+        best = max(range(self.first[root], self.first[root] + self.count[root]), key=lambda n: (self.visits[n], self.value[n]))
+        return divmod(self.move[best], board.cols)
+
+    def zobrist_keys(self, size):
+        # Position wants Zobrist keys; the tree is indexed by moves, so all zero will do
+        if self.zobrist is None or len(self.zobrist[1]) != size:
+            self.zobrist = [None, [0] * size, [0] * size]
+        return self.zobrist
+
+    def iterate(self, pos):
+        # Select a leaf with UCT, expand it, score it with one batch of playouts, back the result up
+        node = self.root
+        played = []
+        while self.count[node] > 0 and not self.winner[node]:
+            node = self.select(node)
+            played.append((self.move[node], self.mover[node]))
+            pos.play(self.move[node], self.mover[node])
+
+        if not self.winner[node] and self.count[node] == -1:
+            self.expand(node, pos)
+            if self.count[node] > 0:
+                node = self.select(node)
+                played.append((self.move[node], self.mover[node]))
+                pos.play(self.move[node], self.mover[node])
+
+        mover = self.mover[node]
+        if self.winner[node]:
+            wins, games = float(self.batch), self.batch
+        elif self.count[node] == 0 and pos.stones == pos.size:
+            wins, games = self.batch / 2, self.batch
+        else:
+            cells = np.array(pos.cells, dtype=np.int8).reshape(pos.rows, pos.cols)
+            winners = batch_rollouts(cells, 3 - mover, self.batch, self.rng)
+            wins = np.count_nonzero(winners == mover) + 0.5 * np.count_nonzero(winners == 0)
+            games = self.batch
+        # terminal leaves count too, or a tree whose every line is decided would never use up the budget
+        self.playouts += games
+
+        for move, player in reversed(played):
+            pos.undo(move, player)
+        while node != -1:
+            self.visits[node] += games
+            self.value[node] += wins if self.mover[node] == mover else games - wins
+            node = self.parent[node]
+
+    def select(self, node):
+        log_n = math.log(self.visits[node] + 1)
+        best, best_score = -1, -1.0
+        for child in range(self.first[node], self.first[node] + self.count[node]):
+            visits = self.visits[child]
+            if visits == 0:
+                return child
+            score = self.value[child] / visits + self.c * math.sqrt(log_n / visits)
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+    def expand(self, node, pos):
+        player = 3 - self.mover[node]
+        # most threatening moves first, so they are the first children UCT tries
+        moves = sorted(pos.candidates(), key=lambda i: -(pos.gain(i, player)[0] + pos.gain(i, 3 - player)[0]))
+        if self.size + len(moves) > self.max_nodes:
+            # memory cap reached: the node stays a leaf and keeps being scored by playouts
+            return
+        self.first[node] = self.size
+        self.count[node] = len(moves)
+        for i in moves:
+            child = self.size
+            self.parent[child] = node
+            self.move[child] = i
+            self.mover[child] = player
+            self.count[child] = -1
+            self.visits[child] = 0
+            self.value[child] = 0.0
+            self.winner[child] = player if pos.gain(i, player)[1] else 0
+            self.size += 1
+
+
+if __name__ == "__main__":
+    board = CaroBoard(15, 15)
+    for move in ((7, 7), (7, 8), (8, 8), (6, 6)):
+        board.push(move)
+    cells = board.cells.astype(np.int8)
+
+    rng = np.random.default_rng(0)
+    n = 1024
+    start = time.perf_counter()
+    batch_rollouts(cells, 1, n, rng)
+    t_batch = time.perf_counter() - start
+
+    py_rng = random.Random(0)
+    loops = 200
+    start = time.perf_counter()
+    for _ in range(loops):
+        python_rollout(cells, 1, py_rng)
+    t_loop = time.perf_counter() - start
+    print(f"batched rollouts {n / t_batch:8.0f} playouts/s | python loop {loops / t_loop:6.0f} playouts/s "
+          f"({n / t_batch / (loops / t_loop):.1f}x)")
+
+    mcts = MCTS(time_limit=2.0)
+    move = mcts.best_move(board, 1)
+    print(f"MCTS: {move} after {mcts.playouts} playouts, {mcts.playouts_per_sec:.0f} playouts/s, "
+          f"{mcts.nodes} nodes")
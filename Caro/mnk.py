@@ -0,0 +1,512 @@
+import argparse
+import mmap
+import os
+import struct
+import time
+from array import array
+from bisect import bisect_left
+from math import comb
+
+from board import CaroBoard
+
+FULL_TABLE_LIMIT = 1 << 26  # boards with more legal positions than this keep only the solved ones
+SOLVABLE_CELLS = 25  # 5x5 takes minutes to solve, every cell more multiplies that, so bigger boards are refused
+TABLE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOSS, DRAW, WIN = -1, 0, 1  # for the side to move
+# table bytes: 0 not solved, otherwise the value is (byte & 3) - 2 if exact, lower and upper bounds packed
+# two bits each when the pruned search only proved a bound
+
+TABLE_MAGIC = b"MNK1"
+# magic, rows, cols, k, game value, packed (1) or sparse (0), legal positions, solved positions; then
+# packed: a bitmap of the solved ranks (u64 words), the solved count before each word (u32), the entries
+# sparse: the solved ranks sorted (u64), the entries. The arrays are in the byte order of the machine
+TABLE_HEADER = struct.Struct("<4sBBBbB7xQQ")
+
+
+class Cancelled(Exception):
+    pass
+
+
+def table_path(rows, cols, k):
+    return os.path.join(TABLE_DIR, f"mnk_{rows}x{cols}x{k}.bin")
+
+
+def pack(lower, upper):
+    return (lower + 2) | (upper + 2) << 2
+
+
+def unpack(entry):
+    return (entry & 3) - 2, (entry >> 2) - 2
+
+
+def symmetries(rows, cols):
+    # Cell permutations that map the board onto itself: 8 for a square board, 4 otherwise
+    transforms = [lambda r, c: (r, c), lambda r, c: (rows - 1 - r, c),
+                  lambda r, c: (r, cols - 1 - c), lambda r, c: (rows - 1 - r, cols - 1 - c)]
+    if rows == cols:
+        n = rows - 1
+        transforms += [lambda r, c: (c, r), lambda r, c: (c, n - r), lambda r, c: (n - c, r), lambda r, c: (n - c, n - r)]
+    perms = []
+    for t in transforms:
+        perm = [0] * (rows * cols)
+        for r in range(rows):
+            for c in range(cols):
+                tr, tc = t(r, c)
+                perm[r * cols + c] = tr * cols + tc
+        perms.append(perm)
+    return perms
+
+
+class Solver:
+    # Strong solver for small m,n,k games (k in a row on an m x n board, X moves first).
+    # A position is two bitmasks, x and o. Results are stored once per symmetry class, under the
+    # position's rank among all legal positions (a perfect hash), one byte each: while solving in a
+    # full bytearray when every rank fits, otherwise in a dict. A finished solve is frozen to the
+    # solved positions only, which save() writes and load() memory-maps like the opening book.
+    # Ranks count every legal position, not symmetry classes, so most of a full table stays empty
+    # (4x4x4: 1.1M solved of 10.2M); frozen, a bitmap of the solved ranks takes their place.
+    def __init__(self, rows, cols, k):
+        self.rows = rows
+        self.cols = cols
+        self.k = k
+        n = self.size = rows * cols
+        self.full = (1 << n) - 1
+
+        # every line of k cells, and the lines through each cell
+        self.lines = []
+        self.cell_lines = [[] for _ in range(n)]
+        for r in range(rows):
+            for c in range(cols):
+                for dr, dc in ((0, 1), (1, 0), (1, 1), (-1, 1)):
+                    end_r, end_c = r + dr * (k - 1), c + dc * (k - 1)
+                    if 0 <= end_r < rows and 0 <= end_c < cols:
+                        cells = [(r + dr * i) * cols + c + dc * i for i in range(k)]
+                        mask = sum(1 << i for i in cells)
+                        self.lines.append(mask)
+                        for i in cells:
+                            self.cell_lines[i].append(mask)
+        # cells tried from the centre out, which finds wins and refutations early
+        centre_r, centre_c = (rows - 1) / 2, (cols - 1) / 2
+        self.order = sorted(range(n), key=lambda i: (abs(i // cols - centre_r) + abs(i % cols - centre_c),
+                                                      -len(self.cell_lines[i])))
+
+        # each symmetry as one lookup table per byte of a mask, so a mask maps in size / 8 steps
+        self.byte_maps = []
+        for perm in symmetries(rows, cols):
+            maps = []
+            for b in range(0, n, 8):
+                table = []
+                for value in range(256):
+                    mapped = 0
+                    for j in range(8):
+                        if value >> j & 1 and b + j < n:
+                            mapped |= 1 << perm[b + j]
+                    table.append(mapped)
+                maps.append(table)
+            self.byte_maps.append(maps)
+
+        # ranks: positions with s stones start at offsets[s], X's cells are ranked among all
+        # cells and O's among the cells X left free
+        self.binom = [[comb(i, j) for j in range(n + 2)] for i in range(n + 1)]
+        self.offsets = []
+        self.count = 0
+        for s in range(n + 1):
+            self.offsets.append(self.count)
+            nx, no = (s + 1) // 2, s // 2
+            self.count += comb(n, nx) * comb(n - nx, no)
+
+        self.table = None  # the full table, only while solve() searches exhaustively
+        self.memo = {}  # rank -> entry for positions solved since the table was last frozen
+        # once frozen: the solved entries in rank order, found through a bitmap of the solved ranks
+        # (bits, and before, the entries ahead of each word) or, for sparse solves, the sorted ranks
+        self.bits = None
+        self.before = None
+        self.ranks = array("Q")
+        self.entries = bytearray()
+        self.file = self.data = None
+        self.nodes = 0
+        self.value = None
+        self.stop = None  # callable, a search is abandoned with Cancelled as soon as it returns True
+
+    def canonical(self, x, o):
+        # Smallest (x, o) over the symmetries, compared as one integer
+        n = self.size
+        best = None
+        for maps in self.byte_maps:
+            tx = to = 0
+            shift = 0
+            for table in maps:
+                tx |= table[x >> shift & 255]
+                to |= table[o >> shift & 255]
+                shift += 8
+            key = tx << n | to
+            if best is None or key < best:
+                best = key
+        return best >> n, best & self.full
+
+    def rank(self, x, o):
+        binom = self.binom
+        rank_x = rank_o = 0
+        seen_x = seen_o = free = 0
+        for i in range(self.size):
+            if x >> i & 1:
+                seen_x += 1
+                rank_x += binom[i][seen_x]
+            else:
+                if o >> i & 1:
+                    seen_o += 1
+                    rank_o += binom[free][seen_o]
+                free += 1
+        return self.offsets[seen_x + seen_o] + rank_x * binom[self.size - seen_x][seen_o] + rank_o
+
+    def index(self, x, o):
+        return self.rank(*self.canonical(x, o))
+
+    def wins(self, mask, cell):
+        for line in self.cell_lines[cell]:
+            if mask & line == line:
+                return True
+        return False
+
+    def entry(self, key):
+        if self.table is not None:
+            return self.table[key]
+        entry = self.memo.get(key)
+        if entry is not None:
+            return entry
+        if self.bits is not None:
+            word = self.bits[key >> 6]
+            bit = key & 63
+            if not word >> bit & 1:
+                return 0
+            return self.entries[self.before[key >> 6] + bin(word & (1 << bit) - 1).count("1")]
+        i = bisect_left(self.ranks, key)
+        return self.entries[i] if i < len(self.ranks) and self.ranks[i] == key else 0
+
+    def store(self, key, entry):
+        if self.table is not None:
+            self.table[key] = entry
+        else:
+            self.memo[key] = entry
+
+    def solve(self):
+        # Value of the empty board for X. A board that fits the full table is searched exhaustively so
+        # every reachable position gets its exact value; bigger boards are proved with alpha-beta
+        # and keep only the positions the proof visited.
+        self.nodes = 0
+        if self.count <= FULL_TABLE_LIMIT:
+            self.table = bytearray(self.count)
+            self.value = self.search_all(0, 0)
+        else:
+            self.value = self.search(0, 0, LOSS, WIN)
+        self.freeze()
+        return self.value
+
+    def freeze(self):
+        # Keep only the solved entries: the full table becomes a bitmap of its solved ranks with
+        # the entries packed behind it, the solving dict sorted arrays that lookups binary search
+        if self.table is not None:
+            words = (self.count + 63) // 64
+            self.bits = array("Q", bytes(8 * words))
+            for rank, entry in enumerate(self.table):
+                if entry:
+                    self.bits[rank >> 6] |= 1 << (rank & 63)
+            self.before = array("I", bytes(4 * words))
+            solved = 0
+            for i, word in enumerate(self.bits):
+                self.before[i] = solved
+                solved += bin(word).count("1")
+            self.entries = bytes(self.table).replace(b"\0", b"")
+            self.table = None
+        else:
+            keys = sorted(self.memo)
+            self.ranks = array("Q", keys)
+            self.entries = bytearray(self.memo[key] for key in keys)
+            self.memo = {}
+
+    def save(self, path):
+        # Write the frozen table for load()
+        packed = self.bits is not None
+        with open(path, "wb") as f:
+            f.write(TABLE_HEADER.pack(TABLE_MAGIC, self.rows, self.cols, self.k, self.value, packed,
+                                      self.count, len(self.entries)))
+            if packed:
+                f.write(self.bits)
+                f.write(self.before)
+            else:
+                f.write(self.ranks)
+            f.write(self.entries)
+
+    @classmethod
+    def load(cls, path):
+        # A solver answering from a table save() wrote. The file is memory-mapped, so loading reads
+        # nothing and a lookup only touches the pages it needs
+        f = open(path, "rb")
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, rows, cols, k, value, packed, count, solved = TABLE_HEADER.unpack_from(data, 0)
+        solver = cls(rows, cols, k)
+        if magic != TABLE_MAGIC or count != solver.count:
+            data.close()
+            f.close()
+            raise ValueError(f"{path} is not an m,n,k table")
+        solver.file, solver.data = f, data
+        view = memoryview(data)
+        offset = TABLE_HEADER.size
+        if packed:
+            words = (count + 63) // 64
+            solver.bits = view[offset:offset + 8 * words].cast("Q")
+            offset += 8 * words
+            solver.before = view[offset:offset + 4 * words].cast("I")
+            offset += 4 * words
+        else:
+            solver.ranks = view[offset:offset + 8 * solved].cast("Q")
+            offset += 8 * solved
+        solver.entries = view[offset:offset + solved]
+        solver.value = value
+        return solver
+
+    def close(self):
+        if self.data is not None:
+            # the views into the map have to go before it can be closed
+            for view in (self.bits, self.before, self.ranks, self.entries):
+                if isinstance(view, memoryview):
+                    view.release()
+            self.bits = self.before = None
+            self.ranks, self.entries = array("Q"), bytearray()
+            self.data.close()
+            self.file.close()
+            self.data = self.file = None
+
+    def search_all(self, x, o):
+        # Exact value for the side to move, every move searched
+        key = self.index(x, o)
+        entry = self.table[key]
+        if entry:
+            return (entry & 3) - 2
+        self.nodes += 1
+        x_to_move = bin(x).count("1") == bin(o).count("1")
+        me, other = (x, o) if x_to_move else (o, x)
+        empty = self.full & ~(x | o)
+        best = LOSS if empty else DRAW
+        for cell in self.order:
+            bit = 1 << cell
+            if not empty & bit:
+                continue
+            if self.wins(me | bit, cell):
+                value = WIN
+            elif x_to_move:
+                value = -self.search_all(x | bit, o)
+            else:
+                value = -self.search_all(x, o | bit)
+            if value > best:
+                best = value
+        self.table[key] = pack(best, best)
+        return best
+
+    def search(self, x, o, alpha, beta):
+        # Value for the side to move within (alpha, beta); the bounds it proves are kept
+        key = self.index(x, o)
+        entry = self.entry(key)
+        if entry:
+            lower, upper = unpack(entry)
+            if lower == upper or lower >= beta or upper <= alpha:
+                return lower if lower >= beta or lower == upper else upper
+            alpha, beta = max(alpha, lower), min(beta, upper)
+        else:
+            lower, upper = LOSS, WIN
+        self.nodes += 1
+        if self.stop is not None and self.nodes & 1023 == 0 and self.stop():
+            raise Cancelled
+        x_to_move = bin(x).count("1") == bin(o).count("1")
+        me, other = (x, o) if x_to_move else (o, x)
+        empty = self.full & ~(x | o)
+        if not empty:
+            return DRAW
+        moves = [cell for cell in self.order if empty >> cell & 1]
+
+        for cell in moves:
+            if self.wins(me | 1 << cell, cell):
+                self.store(key, pack(WIN, WIN))
+                return WIN
+        # the opponent's winning cells must be blocked; with two of them the game is lost
+        threats = [cell for cell in moves if self.wins(other | 1 << cell, cell)]
+        if len(threats) > 1:
+            self.store(key, pack(LOSS, LOSS))
+            return LOSS
+        if threats:
+            moves = threats
+        else:
+            # lines a side can still complete; a side with none can at best draw
+            my_lines = [line for line in self.lines if not line & other]
+            other_lines = [line for line in self.lines if not line & me]
+            if not my_lines:
+                upper = min(upper, DRAW)
+            if not other_lines:
+                lower = max(lower, DRAW)
+            if lower == upper or lower >= beta or upper <= alpha:
+                self.store(key, pack(lower, upper))
+                return lower if lower >= beta or lower == upper else upper
+            alpha, beta = max(alpha, lower), min(beta, upper)
+            moves = self.order_moves(moves, me, other, my_lines, other_lines)
+
+        start_alpha = alpha
+        best = LOSS
+        for cell in moves:
+            bit = 1 << cell
+            if x_to_move:
+                value = -self.search(x | bit, o, -beta, -alpha)
+            else:
+                value = -self.search(x, o | bit, -beta, -alpha)
+            if value > best:
+                best = value
+                if best > alpha:
+                    alpha = best
+                if alpha >= beta:
+                    break
+        if best >= beta:
+            lower = max(lower, best)
+        elif best <= start_alpha:
+            upper = min(upper, best)
+        else:
+            lower = upper = best
+        self.store(key, pack(lower, upper))
+        return best
+
+    def order_moves(self, moves, me, other, my_lines, other_lines):
+        # Cells on the most advanced live lines first. Cells on no live line change nothing,
+        # so one of them stands for all (it is a pass)
+        score = dict.fromkeys(moves, 0)
+        for lines, own in ((my_lines, me), (other_lines, other)):
+            for line in lines:
+                weight = 1 << 3 * bin(line & own).count("1")
+                free = line & ~own
+                while free:
+                    bit = free & -free
+                    score[bit.bit_length() - 1] += weight
+                    free ^= bit
+        live = sorted((cell for cell in moves if score[cell]), key=lambda cell: -score[cell])
+        dead = next((cell for cell in moves if not score[cell]), None)
+        return live if dead is None else live + [dead]
+
+    def masks(self, board):
+        x = o = 0
+        for i, p in enumerate(board.cells.ravel().tolist()):
+            if p == 1:
+                x |= 1 << i
+            elif p == 2:
+                o |= 1 << i
+        return x, o
+
+    def exact(self, x, o):
+        # Exact value for the side to move, from the table when it has one and by search otherwise
+        entry = self.entry(self.index(x, o))
+        if entry:
+            lower, upper = unpack(entry)
+            if lower == upper:
+                return lower
+        if self.table is not None:
+            return self.search_all(x, o)
+        return self.search(x, o, LOSS, WIN)
+
+    def lookup(self, board):
+        # Game value for the side to move on board: WIN, DRAW or LOSS
+        return self.exact(*self.masks(board))
+
+    def at_most(self, x, o, value):
+        # Whether the side to move can do no better than value, a null window search on big boards
+        if self.table is not None or value == WIN:
+            return self.exact(x, o) <= value
+        return self.search(x, o, value, value + 1) <= value
+
+    def best_move(self, board, player):
+        # A move that keeps the game value for player, as (row, col); an immediate win first
+        x, o = self.masks(board)
+        empty = self.full & ~(x | o)
+        if board.winner or not empty:
+            return None
+        moves = [cell for cell in self.order if empty >> cell & 1]
+        for cell in moves:
+            if self.wins((x if player == 1 else o) | 1 << cell, cell):
+                return divmod(cell, self.cols)
+        target = self.exact(x, o)
+        for cell in moves:
+            bit = 1 << cell
+            if self.at_most(*((x | bit, o) if player == 1 else (x, o | bit)), -target):
+                return divmod(cell, self.cols)
+        return divmod(moves[0], self.cols)
+
+    @property
+    def table_bytes(self):
+        if self.table is not None:
+            return len(self.table)
+        if self.bits is not None:
+            return len(self.bits) * self.bits.itemsize + len(self.before) * self.before.itemsize + len(self.entries)
+        return len(self.ranks) * self.ranks.itemsize + len(self.entries)
+
+    @property
+    def solved(self):
+        if self.table is not None:
+            return self.count - self.table.count(0)
+        return len(self.entries)
+
+
+def load_or_solve(rows, cols, k, path=None):
+    # The solver from its table file, solved and saved there first when there is none yet
+    path = path or table_path(rows, cols, k)
+    if os.path.exists(path):
+        return Solver.load(path)
+    if rows * cols > SOLVABLE_CELLS:
+        raise ValueError(f"a {rows}x{cols} board is too big to solve, at most {SOLVABLE_CELLS} cells")
+    solver = Solver(rows, cols, k)
+    solver.solve()
+    solver.save(path)
+    return solver
+
+
+def benchmark(rows, cols, k, lookups=20000):
+    solver = Solver(rows, cols, k)
+    start = time.perf_counter()
+    value = solver.solve()
+    solve_time = time.perf_counter() - start
+    nodes = solver.nodes
+
+    # lookups on positions reached by perfect play from random openings
+    board = CaroBoard(rows, cols, win_length=k)
+    positions = []
+    player = 1
+    while not board.winner and len(board.stack) < rows * cols:
+        positions.append(solver.masks(board))
+        board.place_move(*solver.best_move(board, player), player)
+        player = 3 - player
+    start = time.perf_counter()
+    for i in range(lookups):
+        solver.exact(*positions[i % len(positions)])
+    lookup_time = time.perf_counter() - start
+    return solver, value, nodes, solve_time, lookups / lookup_time, board
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve small m,n,k games exactly")
+    parser.add_argument("games", nargs="*", default=["3x3x3", "4x4x4", "5x5x4"], help="rows x cols x k")
+    parser.add_argument("--save", action="store_true", help="write each table to the file caro.py loads it from")
+    args = parser.parse_args()
+
+    names = {WIN: "first player wins", DRAW: "draw", LOSS: "second player wins"}
+    for game in args.games:
+        rows, cols, k = (int(v) for v in game.split("x"))
+        solver, value, nodes, solve_time, lookups_per_sec, board = benchmark(rows, cols, k)
+        kind = "packed" if solver.bits is not None else "sparse"
+        print(f"{game}: {names[value]} | {nodes} positions searched in {solve_time:.1f}s | "
+              f"{kind} table {solver.solved} entries of {solver.count} legal positions, "
+              f"{solver.table_bytes / 1024:.0f} KiB | {lookups_per_sec:.0f} lookups/s | "
+              f"perfect game {len(board.stack)} moves, winner {board.winner}")
+        if args.save:
+            path = table_path(rows, cols, k)
+            solver.save(path)
+            start = time.perf_counter()
+            loaded = Solver.load(path)
+            load_time = time.perf_counter() - start
+            same = all(loaded.entry(key) == solver.entry(key) for key in range(0, loaded.count, loaded.count // 1000 or 1))
+            print(f"  saved to {path}, {os.path.getsize(path) / 1024:.0f} KiB, loaded in {load_time * 1000:.1f} ms, "
+                  f"{'same' if same else 'DIFFERENT'} entries")
+            loaded.close()
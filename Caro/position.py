@@ -0,0 +1,109 @@
+from board import WIN_LENGTH
+from evaluator import PatternEvaluator
+
+# value of a window of WIN_LENGTH cells holding n stones of one player and none of the other
+WINDOW_SCORE = (0, 1, 10, 100, 1000, 0)
+
+GEOMETRY = {}  # (rows, cols) -> windows, cell_windows, neighbours
+
+
+class Position:
+    # Flat copy of a board made for searching: play/undo in place, Zobrist hash,
+    # per-window stone counts and a pattern evaluator kept up to date on every move.
+    def __init__(self, rows, cols, zobrist):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+        self.zobrist = zobrist
+        self.cells = [0] * self.size
+        self.hash = 0
+        self.patterns = PatternEvaluator(rows, cols)
+        self.stones = 0
+
+        self.windows, self.cell_windows, self.neighbours = self.geometry(rows, cols)
+        self.counts = [None, [0] * len(self.windows), [0] * len(self.windows)]
+        # near[i]: stones within two cells of i, candidates are the empty cells with near > 0
+        self.near = [0] * self.size
+
+    @staticmethod
+    def geometry(rows, cols):
+        # Windows of WIN_LENGTH cells and the two-cell neighbourhood of every cell, built once per size
+        if (rows, cols) in GEOMETRY:
+            return GEOMETRY[(rows, cols)]
+        size = rows * cols
+        windows = []
+        cell_windows = [[] for _ in range(size)]
+        for dr, dc in ((0, 1), (1, 0), (1, 1), (-1, 1)):
+            for r in range(rows):
+                for c in range(cols):
+                    end_r, end_c = r + dr * (WIN_LENGTH - 1), c + dc * (WIN_LENGTH - 1)
+                    if 0 <= end_r < rows and 0 <= end_c < cols:
+                        window = [(r + dr * i) * cols + c + dc * i for i in range(WIN_LENGTH)]
+                        for i in window:
+                            cell_windows[i].append(len(windows))
+                        windows.append(window)
+        neighbours = [[] for _ in range(size)]
+        for r in range(rows):
+            for c in range(cols):
+                for nr in range(max(0, r - 2), min(rows, r + 3)):
+                    for nc in range(max(0, c - 2), min(cols, c + 3)):
+                        if (nr, nc) != (r, c):
+                            neighbours[r * cols + c].append(nr * cols + nc)
+        GEOMETRY[(rows, cols)] = windows, cell_windows, neighbours
+        return GEOMETRY[(rows, cols)]
+
+    @classmethod
+    def from_board(cls, board, zobrist):
+        pos = cls(board.rows, board.cols, zobrist)
+        for i, player in enumerate(board.cells.ravel().tolist()):
+            if player:
+                pos.play(i, player)
+        return pos
+
+    def gain(self, i, player):
+        # How much the score changes for player when playing i, and whether it makes five
+        own_counts = self.counts[player]
+        opp_counts = self.counts[3 - player]
+        gain = 0
+        five = False
+        for w in self.cell_windows[i]:
+            own = own_counts[w]
+            opp = opp_counts[w]
+            if opp == 0:
+                gain += WINDOW_SCORE[own + 1] - WINDOW_SCORE[own]
+                if own + 1 == WIN_LENGTH:
+                    five = True
+            elif own == 0:
+                gain += WINDOW_SCORE[opp]
+        return gain, five
+
+    def play(self, i, player):
+        # Returns True when the move makes five in a row
+        _, five = self.gain(i, player)
+        counts = self.counts[player]
+        for w in self.cell_windows[i]:
+            counts[w] += 1
+        for j in self.neighbours[i]:
+            self.near[j] += 1
+        self.cells[i] = player
+        self.hash ^= self.zobrist[player][i]
+        self.patterns.place_index(i, player)
+        self.stones += 1
+        return five
+
+    def undo(self, i, player):
+        self.stones -= 1
+        self.hash ^= self.zobrist[player][i]
+        self.patterns.remove_index(i)
+        self.cells[i] = 0
+        for j in self.neighbours[i]:
+            self.near[j] -= 1
+        counts = self.counts[player]
+        for w in self.cell_windows[i]:
+            counts[w] -= 1
+
+    def candidates(self):
+        if self.stones == 0:
+            return [(self.rows // 2) * self.cols + self.cols // 2]
+        cells, near = self.cells, self.near
+        return [i for i in range(self.size) if near[i] and not cells[i]]
@@ -0,0 +1,84 @@
+import socket
+import struct
+
+# Every message is one type byte followed by a fixed-size body.
+JOIN = b"J"     # client: room id (uint32)
+WELCOME = b"W"  # server: your player (1 or 2), rows, cols
+FULL = b"F"     # server: the room already has two players
+MOVE = b"M"     # client: cell (row * cols + col); server: player, cell, winner
+RESET = b"R"    # client: start a new game in the room; server: a new game started
+LEFT = b"L"     # server: the other player left
+ERROR = b"E"    # server: error code
+
+ERR_NOT_YOUR_TURN = 1
+ERR_TAKEN = 2
+ERR_GAME_OVER = 3
+ERR_WAITING = 4
+
+CLIENT_FORMATS = {JOIN: struct.Struct("<I"), MOVE: struct.Struct("<B"), RESET: struct.Struct("")}
+SERVER_FORMATS = {
+    WELCOME: struct.Struct("<BBB"),
+    FULL: struct.Struct(""),
+    MOVE: struct.Struct("<BBB"),
+    RESET: struct.Struct(""),
+    LEFT: struct.Struct(""),
+    ERROR: struct.Struct("<B"),
+}
+
+
+def pack(kind, *values, formats=CLIENT_FORMATS):
+    return kind + formats[kind].pack(*values)
+
+
+def pack_server(kind, *values):
+    return pack(kind, *values, formats=SERVER_FORMATS)
+
+
+def unpack_all(buffer, formats=SERVER_FORMATS):
+    # Split a byte buffer into complete (kind, values) messages, returns them and the leftover bytes
+    messages = []
+    offset = 0
+    while offset < len(buffer):
+        kind = buffer[offset:offset + 1]
+        size = formats[kind].size
+        if offset + 1 + size > len(buffer):
+            break
+        messages.append((kind, formats[kind].unpack_from(buffer, offset + 1)))
+        offset += 1 + size
+    return messages, buffer[offset:]
+
+
+class NetClient:
+    # Non-blocking connection for the pygame window: send moves, poll() for server messages each frame
+    def __init__(self, host, port, room):
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.sendall(pack(JOIN, room))
+        self.sock.setblocking(False)
+        self.buffer = b""
+        self.player = None
+        self.rows = self.cols = None  # the server's board, known once WELCOME came
+
+    def send_move(self, row, col):
+        self.sock.sendall(pack(MOVE, row * self.cols + col))
+
+    def send_reset(self):
+        self.sock.sendall(pack(RESET))
+
+    def poll(self):
+        try:
+            while True:
+                data = self.sock.recv(4096)
+                if not data:
+                    break
+                self.buffer += data
+        except BlockingIOError:
+            pass
+        messages, self.buffer = unpack_all(self.buffer)
+        for kind, values in messages:
+            if kind == WELCOME:
+                self.player, self.rows, self.cols = values
+        return messages
+
+    def close(self):
+        self.sock.close()
@@ -0,0 +1,147 @@
+import multiprocessing as mp
+import os
+import queue
+import statistics
+import time
+
+from board import WIN_LENGTH, CaroBoard
+from engine import Engine
+
+GUESS_TIME = 0.2  # seconds spent guessing the opponent's move before pondering
+
+
+def search_worker(jobs, results, cancelled, config, book_path, game=None):
+    # Runs in its own process; one Engine for the whole game so its transposition table stays warm.
+    # With game, (rows, cols, k) of a small m,n,k game, the exact solver plays instead
+    if game is not None:
+        solver_worker(jobs, results, cancelled, game)
+        return
+    engine = Engine(**config)
+    if book_path is not None and os.path.exists(book_path):
+        from book import OpeningBook
+        engine.book = OpeningBook(book_path)
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, kind, rows, cols, k, moves, player, time_limit = job
+        board = CaroBoard(rows, cols, win_length=k)
+        for row, col, p in moves:
+            board.place_move(row, col, p)
+
+        engine.stop = lambda: cancelled.value >= job_id
+        if kind == "ponder":
+            # guess the opponent's move, then think about the answer to it until cancelled
+            engine.on_iteration = None
+            engine.time_limit = GUESS_TIME
+            guess = engine.best_move(board, 3 - player)
+            if guess is None or cancelled.value >= job_id:
+                continue
+            results.put(("guess", job_id, guess))
+            board.place_move(*guess, 3 - player)
+            time_limit = None
+        engine.on_iteration = lambda e: results.put(("info", job_id, e.depth, e.score, e.pv, e.nodes, e.nps))
+        engine.time_limit = time_limit
+        move = engine.best_move(board, player)
+        results.put(("done", job_id, move, engine.depth, engine.score, engine.nodes, engine.nps))
+
+
+def solver_worker(jobs, results, cancelled, game):
+    # The solver's table is loaded (or solved the first time) here and not in the window's process.
+    # A position the table does not hold is searched, which can take long on the sparse tables
+    from mnk import Cancelled, load_or_solve
+    solver = load_or_solve(*game)
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, kind, rows, cols, k, moves, player, time_limit = job
+        if kind == "ponder":
+            continue  # the table has nothing to gain from the opponent's time
+        board = CaroBoard(rows, cols, win_length=k)
+        for row, col, p in moves:
+            board.place_move(row, col, p)
+        solver.stop = lambda: cancelled.value >= job_id
+        solver.nodes = 0
+        start = time.perf_counter()
+        try:
+            value = solver.lookup(board)  # WIN, DRAW or LOSS for player; best_move finds it again in the memo
+            move = solver.best_move(board, player)
+        except Cancelled:
+            continue
+        elapsed = time.perf_counter() - start
+        # searched to the end of the game: depth is the number of empty cells
+        results.put(("done", job_id, move, rows * cols - len(moves), value, solver.nodes,
+                     solver.nodes / elapsed if elapsed > 0 else 0.0))
+
+
+class SearchScheduler:
+    # Keeps the engine in a worker process so the pygame loop never blocks on a search.
+    # Progress comes back through a queue; a new think/ponder cancels whatever was running.
+    # With game set to (rows, cols, k) the worker plays from the m,n,k solver's table instead.
+    def __init__(self, config=None, book_path=None, game=None):
+        self.jobs = mp.Queue()
+        self.results = mp.Queue()
+        self.cancelled = mp.Value("i", 0)
+        self.job_id = 0
+        self.kind = None
+        self.process = mp.Process(target=search_worker, daemon=True,
+                                  args=(self.jobs, self.results, self.cancelled, config or {}, book_path, game))
+        self.process.start()
+
+    def submit(self, kind, board, player, time_limit):
+        self.cancel()
+        self.job_id += 1
+        self.kind = kind
+        moves = [(move[0], move[1], move[2]) for move in board.stack]
+        k = getattr(board, "win_length", WIN_LENGTH)
+        self.jobs.put((self.job_id, kind, board.rows, board.cols, k, moves, player, time_limit))
+        return self.job_id
+
+    def think(self, board, player, time_limit):
+        return self.submit("think", board, player, time_limit)
+
+    def ponder(self, board, player):
+        # Use the opponent's thinking time: player is the side that moves after the opponent
+        return self.submit("ponder", board, player, None)
+
+    def cancel(self):
+        self.cancelled.value = self.job_id
+        self.kind = None
+
+    @property
+    def thinking(self):
+        return self.kind == "think"
+
+    def poll(self):
+        # Messages of the current job that arrived since the last call, never blocks
+        messages = []
+        while True:
+            try:
+                message = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if message[1] != self.job_id or self.kind is None:
+                continue
+            if message[0] == "done":
+                # a finished ponder has nothing to play, its work is kept in the engine's table
+                if self.kind == "think":
+                    messages.append(message)
+                self.kind = None
+            else:
+                messages.append(message)
+        return messages
+
+    def close(self):
+        self.cancel()
+        self.jobs.put(None)
+        self.process.join(timeout=1)
+
+
+def frame_stats(frame_times):
+    # Mean, standard deviation, 99th percentile and worst frame time in ms
+    if len(frame_times) < 2:
+        return None
+    ordered = sorted(frame_times)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return statistics.mean(frame_times), statistics.stdev(frame_times), p99, ordered[-1]
@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+
+from board import CaroBoard
+from protocol import (CLIENT_FORMATS, ERR_GAME_OVER, ERR_NOT_YOUR_TURN, ERR_TAKEN, ERR_WAITING, ERROR, FULL,
+                      JOIN, LEFT, MOVE, RESET, WELCOME, pack_server)
+
+ROWS, COLS = 15, 15
+
+
+class Room:
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.players = [None, None]  # stream writers of player 1 and 2
+        self.new_game()
+
+    def new_game(self):
+        self.board = CaroBoard(self.rows, self.cols)
+        self.turn = 1
+
+    def broadcast(self, message):
+        for writer in self.players:
+            if writer is not None:
+                writer.write(message)
+
+    def move(self, player, cell):
+        # Apply a move, returns an error code or None
+        if None in self.players:
+            return ERR_WAITING
+        if self.board.winner or len(self.board.stack) == self.rows * self.cols:
+            return ERR_GAME_OVER
+        if player != self.turn:
+            return ERR_NOT_YOUR_TURN
+        if not self.board.place_move(cell // self.cols, cell % self.cols, player):
+            return ERR_TAKEN
+        self.turn = 3 - player
+        self.broadcast(pack_server(MOVE, player, cell, self.board.winner))
+        return None
+
+
+class CaroServer:
+    # Many two-player rooms on one asyncio loop; the rules are CaroBoard's, one board per room
+    def __init__(self, rows=ROWS, cols=COLS):
+        self.rows = rows
+        self.cols = cols
+        self.rooms = {}
+
+    async def handle(self, reader, writer):
+        room = None
+        player = None
+        try:
+            kind = await reader.readexactly(1)
+            if kind != JOIN:
+                return
+            (room_id,) = CLIENT_FORMATS[JOIN].unpack(await reader.readexactly(CLIENT_FORMATS[JOIN].size))
+            room = self.rooms.setdefault(room_id, Room(self.rows, self.cols))
+            if None not in room.players:
+                writer.write(pack_server(FULL))
+                return
+            player = room.players.index(None) + 1
+            room.players[player - 1] = writer
+            writer.write(pack_server(WELCOME, player, self.rows, self.cols))
+            if None not in room.players:
+                room.new_game()
+                room.broadcast(pack_server(RESET))
+
+            while True:
+                kind = await reader.readexactly(1)
+                if kind == MOVE:
+                    (cell,) = await reader.readexactly(1)
+                    error = room.move(player, cell)
+                    if error is not None:
+                        writer.write(pack_server(ERROR, error))
+                elif kind == RESET:
+                    room.new_game()
+                    room.broadcast(pack_server(RESET))
+                else:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if player is not None:
+                room.players[player - 1] = None
+                room.broadcast(pack_server(LEFT))
+                if room.players == [None, None]:
+                    del self.rooms[room_id]
+            writer.close()
+
+    async def serve(self, host, port, ready=None):
+        server = await asyncio.start_server(self.handle, host, port, backlog=4096)
+        if ready is not None:
+            ready.set()
+        async with server:
+            await server.serve_forever()
+
+
+def raise_file_limit():
+    # Every client is a socket; the default limit of 1024 open files is too low for thousands of rooms
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def run_server(host="127.0.0.1", port=5555, ready=None):
+    raise_file_limit()
+    asyncio.run(CaroServer().serve(host, port, ready))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Caro PvP room server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5555)
+    args = parser.parse_args()
+    print(f"Serving Caro rooms on {args.host}:{args.port}")
+    run_server(args.host, args.port)
@@ -0,0 +1,122 @@
+import math
+
+from board import DIRECTIONS, WIN_LENGTH
+
+CHUNK = 16  # stones are also indexed by CHUNK x CHUNK block so drawing only visits what is on screen
+
+
+class SparseBoard:
+    # Unbounded (or very large) board: only the stones are stored, so memory grows with the
+    # number of moves and not with the board area. Wins are checked around the last move only.
+    def __init__(self, rows=None, cols=None):
+        self.rows = rows  # None for no limit
+        self.cols = cols
+        self.stones = {}  # (row, col) -> player
+        self.chunks = {}  # (row // CHUNK, col // CHUNK) -> {(row, col): player}
+        self.stack = []   # (row, col, player, winner before the move)
+        self.winner = 0
+
+    def inside(self, row, col):
+        if self.rows is not None and not 0 <= row < self.rows:
+            return False
+        if self.cols is not None and not 0 <= col < self.cols:
+            return False
+        return True
+
+    def get(self, row, col):
+        return self.stones.get((row, col), 0)
+
+    def place_move(self, row, col, player):
+        if self.inside(row, col) and (row, col) not in self.stones:
+            self.stones[(row, col)] = player
+            self.chunks.setdefault((row // CHUNK, col // CHUNK), {})[(row, col)] = player
+            self.stack.append((row, col, player, self.winner))
+            if self.line_length(row, col, player) >= WIN_LENGTH:
+                self.winner = player
+            return True
+        return False
+
+    def push(self, move):
+        player = 1 if len(self.stack) % 2 == 0 else 2
+        return self.place_move(move[0], move[1], player)
+
+    def pop(self):
+        if not self.stack:
+            return None
+        row, col, player, self.winner = self.stack.pop()
+        del self.stones[(row, col)]
+        chunk = self.chunks[(row // CHUNK, col // CHUNK)]
+        del chunk[(row, col)]
+        if not chunk:
+            del self.chunks[(row // CHUNK, col // CHUNK)]
+        return row, col, player
+
+    def line_length(self, row, col, player):
+        # Longest line of player stones through (row, col)
+        stones = self.stones
+        longest = 0
+        for dr, dc in DIRECTIONS:
+            length = 1
+            for sign in (1, -1):
+                r, c = row + sign * dr, col + sign * dc
+                while stones.get((r, c)) == player:
+                    length += 1
+                    r, c = r + sign * dr, c + sign * dc
+            longest = max(longest, length)
+        return longest
+
+    def stones_in(self, top, left, bottom, right):
+        # Stones with top <= row < bottom and left <= col < right, visiting only the chunks that overlap
+        for cr in range(top // CHUNK, (bottom - 1) // CHUNK + 1):
+            for cc in range(left // CHUNK, (right - 1) // CHUNK + 1):
+                chunk = self.chunks.get((cr, cc))
+                if chunk:
+                    for (r, c), player in chunk.items():
+                        if top <= r < bottom and left <= c < right:
+                            yield r, c, player
+
+
+class Viewport:
+    # Which part of the board is on screen: top-left corner in cells (floats) and cell size in pixels
+    def __init__(self, width, height, cell_size=40, row=0.0, col=0.0, min_cell=8, max_cell=80):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.row = row
+        self.col = col
+        self.min_cell = min_cell
+        self.max_cell = max_cell
+
+    def centre_on(self, row, col):
+        self.row = row + 0.5 - self.height / self.cell_size / 2
+        self.col = col + 0.5 - self.width / self.cell_size / 2
+
+    def pan(self, dx, dy):
+        # Move the view by a mouse drag of (dx, dy) pixels
+        self.col -= dx / self.cell_size
+        self.row -= dy / self.cell_size
+
+    def zoom(self, factor, x, y):
+        # Zoom around the screen point (x, y) so the cell under the mouse stays put
+        row, col = self.to_cell_float(x, y)
+        self.cell_size = max(self.min_cell, min(self.max_cell, self.cell_size * factor))
+        self.row = row - y / self.cell_size
+        self.col = col - x / self.cell_size
+
+    def to_cell_float(self, x, y):
+        return self.row + y / self.cell_size, self.col + x / self.cell_size
+
+    def to_cell(self, x, y):
+        row, col = self.to_cell_float(x, y)
+        return math.floor(row), math.floor(col)
+
+    def to_screen(self, row, col):
+        # Top-left pixel of a cell
+        return (col - self.col) * self.cell_size, (row - self.row) * self.cell_size
+
+    def visible(self):
+        # (top, left, bottom, right) cell range on screen, bottom/right exclusive
+        top, left = math.floor(self.row), math.floor(self.col)
+        bottom = math.floor(self.row + self.height / self.cell_size) + 1
+        right = math.floor(self.col + self.width / self.cell_size) + 1
+        return top, left, bottom, right
@@ -0,0 +1,157 @@
+import random
+
+from position import Position
+
+
+class NodeLimit(Exception):
+    pass
+
+
+class ThreatSearch:
+    # Forced-win search that only looks at threats: fours (VCF) and, with vct=True, open threes too.
+    # The defender only gets the replies that stop the last threat, or a four of their own,
+    # so the tree stays small and the search can go 20+ plies deep.
+    def __init__(self, max_nodes=50000, max_depth=30, vct=False):
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.vct = vct
+        self.nodes = 0
+        self.zobrist = None
+
+    def solve(self, board, player):
+        # Returns the winning line as (row, col) moves, attacker first, or None when nothing was found
+        if self.zobrist is None or len(self.zobrist[1]) != board.rows * board.cols:
+            rng = random.Random(0)
+            size = board.rows * board.cols
+            self.zobrist = [None] + [[rng.getrandbits(64) for _ in range(size)] for _ in (1, 2)]
+        self.pos = Position.from_board(board, self.zobrist)
+        self.nodes = 0
+        self.failed = {}
+        line = None
+        try:
+            # deepen two plies at a time so short wins are found before long speculative lines
+            for depth in range(1, self.max_depth + 1, 2):
+                line = self.attack(player, depth)
+                if line is not None:
+                    break
+        except NodeLimit:
+            line = None
+        if line is None:
+            return None
+        return [divmod(i, board.cols) for i in line]
+
+    def play(self, i, player):
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            raise NodeLimit
+        self.pos.play(i, player)
+
+    def five_cells(self, player):
+        # Empty cells where player makes five right now
+        pos = self.pos
+        own_counts, opp_counts = pos.counts[player], pos.counts[3 - player]
+        cells = set()
+        for w, window in enumerate(pos.windows):
+            if own_counts[w] == len(window) - 1 and opp_counts[w] == 0:
+                for i in window:
+                    if not pos.cells[i]:
+                        cells.add(i)
+        return cells
+
+    def threat(self, i, player):
+        # (gaps of the fours made by playing i, empty cells of the threes made by playing i)
+        pos = self.pos
+        own_counts, opp_counts = pos.counts[player], pos.counts[3 - player]
+        fours, threes = set(), {}
+        for w in pos.cell_windows[i]:
+            if opp_counts[w]:
+                continue
+            window = pos.windows[w]
+            own = own_counts[w] + 1
+            if own == len(window) - 1:
+                fours.update(j for j in window if j != i and not pos.cells[j])
+            elif own == len(window) - 2:
+                step = window[1] - window[0]
+                threes.setdefault(step, []).append(window)
+        three_cells = set()
+        for windows in threes.values():
+            # two windows on the same line means the three can still become an open four
+            if len(windows) >= 2:
+                for window in windows:
+                    three_cells.update(j for j in window if j != i and not pos.cells[j])
+        return fours, three_cells
+
+    def threat_moves(self, player):
+        fours, threes = [], []
+        for i in self.pos.candidates():
+            gaps, three_cells = self.threat(i, player)
+            if gaps:
+                fours.append((i, gaps))
+            elif self.vct and three_cells:
+                threes.append((i, three_cells))
+        return fours + threes
+
+    def attack(self, player, depth):
+        pos = self.pos
+        defender = 3 - player
+        wins = self.five_cells(player)
+        if wins:
+            return [min(wins)]
+        if depth <= 0 or self.failed.get(pos.hash, -1) >= depth:
+            return None
+        blocks = self.five_cells(defender)
+        if len(blocks) > 1:
+            return None
+
+        for i, _ in self.threat_moves(player):
+            if blocks and i not in blocks:
+                continue
+            self.play(i, player)
+            line = self.defend(i, player, depth - 1)
+            pos.undo(i, player)
+            if line is not None:
+                return [i] + line
+        self.failed[pos.hash] = depth
+        return None
+
+    def defend(self, last, player, depth):
+        # Attacker just played last; try every defence, the attack holds only if all of them lose
+        pos = self.pos
+        defender = 3 - player
+        gaps = self.five_cells(player)
+        if len(gaps) > 1:
+            return [min(gaps)] + [min(gaps - {min(gaps)})]
+        if gaps:
+            defences = gaps
+        else:
+            defences = set()
+            for w in pos.cell_windows[last]:
+                window = pos.windows[w]
+                if pos.counts[player][w] == len(window) - 2 and pos.counts[defender][w] == 0:
+                    defences.update(j for j in window if not pos.cells[j])
+            for i in pos.candidates():
+                if self.threat(i, defender)[0]:
+                    defences.add(i)
+        if not defences:
+            return None
+
+        best = None
+        for d in sorted(defences):
+            self.play(d, defender)
+            line = self.attack(player, depth - 1)
+            pos.undo(d, defender)
+            if line is None:
+                return None
+            if best is None or len(line) + 1 > len(best):
+                best = [d] + line
+        return best
+
+
+def find_vcf(board, player, max_nodes=50000, max_depth=30):
+    # Victory by continuous fours for player to move, as a list of moves or None
+    return ThreatSearch(max_nodes, max_depth).solve(board, player)
+
+
+def find_vct(board, player, max_nodes=50000, max_depth=30):
+    # Victory by continuous fours and threes for player to move, as a list of moves or None
+    return ThreatSearch(max_nodes, max_depth, vct=True).solve(board, player)